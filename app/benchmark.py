@@ -0,0 +1,312 @@
+"""Assignment 2 - Blocky
+
+=== CSC148 Fall 2017 ===
+Diane Horton and David Liu
+Department of Computer Science,
+University of Toronto
+
+
+=== Module Description ===
+
+This file contains a benchmark suite for the hot paths of the game: building,
+laying out, flattening, rotating and drawing boards, generating batches of
+boards, scoring goals, selecting blocks and choosing SmartPlayer moves, on
+boards of several depths.
+
+Run it as a module:
+
+    python -m app.benchmark --output results.json
+    python -m app.benchmark --baseline results.json
+
+Every board is generated from a fixed seed, so runs on the same code do the
+same work.  Boards are generated with app.game.random_init, as in a game: it
+always subdivides the top-level Block, so even the deepest boards are not
+trivially small.
+
+With --baseline, each time is compared with the time recorded in an earlier
+run's JSON output, and the exit status is 1 if any benchmark got slower by
+more than the tolerance.
+"""
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+from app.block import Block
+from app.board_batch import BoardBatch
+from app.game import random_init
+from app.goal import BlobGoal, PerimeterGoal
+from app.player import SmartPlayer
+from app.renderer import BOARD_WIDTH, COLOUR_LIST, NullRenderer
+
+# A function that prepares one round of a benchmark on a board of the given
+# depth, generated from the given seed, and returns the operation to time.
+Setup = Callable[[int, int], Callable[[], object]]
+
+# The number of lookups timed together by the get_selected_block benchmark.
+LOOKUPS = 1000
+
+# The number of boards generated together by the BoardBatch benchmark.
+BATCH = 1000
+
+
+def _board(depth: int, seed: int) -> Block:
+    """Return the board of <depth> generated from <seed>, laid out to fill
+    the window.
+    """
+    random.seed(seed * 1000 + depth)
+    board = random_init(0, depth)
+    board.update_block_locations((0, 0), BOARD_WIDTH)
+    return board
+
+
+def _random_init(depth: int, seed: int) -> Callable[[], object]:
+    """Generate the board of <depth> from <seed>."""
+    def run() -> object:
+        random.seed(seed * 1000 + depth)
+        return random_init(0, depth)
+    return run
+
+
+def _board_batch(depth: int, seed: int) -> Callable[[], object]:
+    """Generate a BoardBatch of BATCH boards of <depth> from <seed>."""
+    return lambda: BoardBatch(BATCH, depth, seed * 1000 + depth)
+
+
+def _leaves(board: Block) -> List[Block]:
+    """Return the undivided Blocks of <board>."""
+    leaves = []
+    stack = [board]
+    while stack:
+        block = stack.pop()
+        if block.children:
+            stack.extend(block.children)
+        else:
+            leaves.append(block)
+    return leaves
+
+
+def _update_block_locations(depth: int, seed: int) -> Callable[[], object]:
+    """Lay out the board and read the position and size of every undivided
+    Block, since positions are only derived when they are read.
+    """
+    board = _board(depth, seed)
+    leaves = _leaves(board)
+
+    def run() -> object:
+        board.update_block_locations((0, 0), BOARD_WIDTH)
+        return [(leaf.position, leaf.size) for leaf in leaves]
+    return run
+
+
+def _flatten(depth: int, seed: int) -> Callable[[], object]:
+    """Flatten the board into lists of colours."""
+    return _board(depth, seed).flatten
+
+
+def _rotate(depth: int, seed: int) -> Callable[[], object]:
+    """Rotate the board and read the position of every undivided Block, as
+    drawing it afterwards does.  Rotation alone only records a pending turn.
+    """
+    board = _board(depth, seed)
+    leaves = _leaves(board)
+
+    def run() -> object:
+        board.rotate(1)
+        return [leaf.position for leaf in leaves]
+    return run
+
+
+def _rectangles_to_draw(depth: int, seed: int) -> Callable[[], object]:
+    """Swap the children of the board and list its rectangles, as the
+    renderer does on the frame after a move.
+    """
+    board = _board(depth, seed)
+
+    def run() -> object:
+        board.swap(0)
+        return board.rectangles_to_draw()
+    return run
+
+
+def _blob_score(depth: int, seed: int) -> Callable[[], object]:
+    """Swap the children of the board and rescore a BlobGoal on it."""
+    board = _board(depth, seed)
+    goal = BlobGoal(COLOUR_LIST[0])
+    goal.score(board)
+
+    def run() -> object:
+        board.swap(0)
+        return goal.score(board)
+    return run
+
+
+def _perimeter_score(depth: int, seed: int) -> Callable[[], object]:
+    """Swap the children of the board and rescore a PerimeterGoal on it."""
+    board = _board(depth, seed)
+    goal = PerimeterGoal(COLOUR_LIST[0])
+
+    def run() -> object:
+        board.swap(0)
+        return goal.score(board)
+    return run
+
+
+def _get_selected_block(depth: int, seed: int) -> Callable[[], object]:
+    """Select the Blocks at LOOKUPS random locations and levels."""
+    board = _board(depth, seed)
+    queries = [((random.randrange(BOARD_WIDTH), random.randrange(BOARD_WIDTH)),
+                random.randint(0, depth)) for _ in range(LOOKUPS)]
+
+    def run() -> object:
+        for location, level in queries:
+            board.get_selected_block(location, level)
+    return run
+
+
+def _smart_player(depth: int, seed: int) -> Callable[[], object]:
+    """Make a move as a SmartPlayer of the highest difficulty."""
+    board = _board(depth, seed)
+    player = SmartPlayer(NullRenderer(), 0, BlobGoal(COLOUR_LIST[0]), 5)
+    return lambda: player.make_move(board)
+
+
+BENCHMARKS: Dict[str, Setup] = {
+    'random_init': _random_init,
+    'BoardBatch': _board_batch,
+    'layout+positions': _update_block_locations,
+    'flatten': _flatten,
+    'rotate+positions': _rotate,
+    'rectangles_to_draw': _rectangles_to_draw,
+    'BlobGoal.score': _blob_score,
+    'PerimeterGoal.score': _perimeter_score,
+    'get_selected_block': _get_selected_block,
+    'SmartPlayer.make_move': _smart_player,
+}
+
+
+def measure(setup: Callable[[], Callable[[], object]], repeat: int,
+            min_time: float) -> float:
+    """Return the best time, in seconds per call, of the operation returned
+    by <setup> over <repeat> rounds.
+
+    Each round calls <setup> once and then the operation at least once, and
+    as many times as fit in <min_time> seconds.
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        run = setup()
+        calls = 0
+        start = time.perf_counter()
+        while True:
+            run()
+            calls += 1
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_time:
+                break
+        best = min(best, elapsed / calls)
+    return best
+
+
+def run_suite(depths: List[int], seed: int, repeat: int, min_time: float,
+              names: Optional[List[str]] = None,
+              verbose: bool = True) -> Dict[str, Dict[str, float]]:
+    """Run the benchmarks called <names>, or all of them if <names> is None,
+    on boards of each depth in <depths>.
+
+    Return results[name][str(depth)], the time in seconds per call.
+    """
+    results: Dict[str, Dict[str, float]] = {}
+    for name in names or BENCHMARKS:
+        results[name] = {}
+        for depth in depths:
+            seconds = measure(lambda: BENCHMARKS[name](depth, seed), repeat,
+                              min_time)
+            results[name][str(depth)] = seconds
+            if verbose:
+                print(f'{name:24} depth {depth}: {_format(seconds)}')
+    return results
+
+
+def compare(results: Dict[str, Dict[str, float]],
+            baseline: Dict[str, Dict[str, float]],
+            tolerance: float) -> List[str]:
+    """Print how each time in <results> compares with the same benchmark in
+    <baseline>, and return the descriptions of those that are slower by more
+    than a fraction <tolerance>.
+    """
+    regressions = []
+    for name, times in results.items():
+        for depth, seconds in times.items():
+            before = baseline.get(name, {}).get(depth)
+            if not before:
+                continue
+            ratio = seconds / before
+            line = f'{name:24} depth {depth}: {_format(before)} -> ' + \
+                f'{_format(seconds)} ({ratio:.2f}x)'
+            if ratio > 1 + tolerance:
+                regressions.append(line)
+                line += '  REGRESSION'
+            print(line)
+    return regressions
+
+
+def _format(seconds: float) -> str:
+    """Return <seconds> in the most readable unit."""
+    if seconds < 1e-3:
+        return f'{seconds * 1e6:9.1f} us'
+    if seconds < 1:
+        return f'{seconds * 1e3:9.2f} ms'
+    return f'{seconds:9.3f} s '
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Run the suite from the command line arguments <argv>, and return the
+    exit status.
+    """
+    parser = argparse.ArgumentParser(
+        prog='python -m app.benchmark',
+        description='Time the hot paths of Blocky at several board depths.')
+    parser.add_argument('--depths', type=int, nargs=2, default=[3, 9],
+                        metavar=('FIRST', 'LAST'),
+                        help='the range of max_depth to run (default 3 9)')
+    parser.add_argument('--only', nargs='+', choices=list(BENCHMARKS),
+                        metavar='NAME', help='run only these benchmarks')
+    parser.add_argument('--seed', type=int, default=148)
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='rounds per benchmark; the best is kept')
+    parser.add_argument('--min-time', type=float, default=0.05,
+                        help='seconds to spend on each round')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--baseline',
+                        help='compare with the results in this JSON file')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='slowdown, as a fraction, that counts as a '
+                             'regression (default 0.25)')
+    args = parser.parse_args(argv)
+
+    depths = list(range(args.depths[0], args.depths[1] + 1))
+    results = run_suite(depths, args.seed, args.repeat, args.min_time,
+                        args.only)
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump({'python': platform.python_version(),
+                       'seed': args.seed,
+                       'results': results}, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)['results']
+        print()
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f'{len(regressions)} regression(s)')
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
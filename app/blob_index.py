@@ -0,0 +1,167 @@
+"""Assignment 2 - Blocky
+
+=== CSC148 Fall 2017 ===
+Diane Horton and David Liu
+Department of Computer Science,
+University of Toronto
+
+
+=== Module Description ===
+
+This file contains the BlobIndex class, which keeps track of the connected
+blobs of one colour on a board so that BlobGoal can be rescored after a move
+by only re-examining the part of the board that the move touched.
+"""
+from typing import Dict, List, Set, Tuple
+from app.block import Block, QUADRANT_OFFSETS
+from app.flood_fill import fill, padded_index, padded_mask
+from app.renderer import colour_index
+
+
+class BlobIndex:
+    """The connected components of one colour on a board, updated
+    incrementally as the board is mutated.
+
+    The index registers itself as an observer of <board>.  Whenever a Block
+    inside the board is swapped, rotated or smashed, the square of unit cells
+    covered by that Block is marked dirty.  The next call to largest() repaints
+    only the dirty squares and recomputes only the components that crossed
+    them.
+
+    === Public Attributes ===
+    board:
+        The Block whose blobs are indexed.
+    colour:
+        The colour whose blobs are indexed.
+    """
+    # === Private Attributes ===
+    # _width:
+    #     The number of unit cells along each side of <board>.
+    # _cells:
+    #     A padded grid, as described in app.flood_fill, whose cells are True
+    #     iff they have the target colour.
+    # _labels:
+    #     _labels[i] is the label of the component containing cell i of the
+    #     padded grid, or -1 if cell i is not of the target colour.
+    # _members:
+    #     Maps each live label to the list of cells in its component.
+    # _next_label:
+    #     The label to give to the next component discovered.
+    # _dirty:
+    #     (column, row, width) squares changed since the last refresh.
+    board: Block
+    colour: Tuple[int, int, int]
+    _width: int
+    _cells: List[bool]
+    _labels: List[int]
+    _members: Dict[int, List[int]]
+    _next_label: int
+    _dirty: List[Tuple[int, int, int]]
+
+    def __init__(self, board: Block, colour: Tuple[int, int, int]) -> None:
+        """Index the blobs of <colour> on <board> and start observing it.
+        """
+        self.board = board
+        self.colour = colour
+        self._width = 2 ** (board.max_depth - board.level)
+        self._cells = padded_mask(board.flatten_array(), colour_index(colour))
+        self._labels = [-1] * len(self._cells)
+        self._members = {}
+        self._next_label = 0
+        self._dirty = []
+        for i in range(len(self._cells)):
+            if self._cells[i] and self._labels[i] == -1:
+                self._label_component(i)
+        board.add_observer(self._block_changed)
+
+    def detach(self) -> None:
+        """Stop observing the board.  The index must not be used afterwards.
+        """
+        self.board.remove_observer(self._block_changed)
+
+    def largest(self) -> int:
+        """Return the size of the largest connected blob of the target colour.
+        """
+        if self._dirty:
+            self._refresh()
+        if not self._members:
+            return 0
+        return max(len(cells) for cells in self._members.values())
+
+    def _block_changed(self, block: Block, moved: bool) -> None:
+        """Mark the square of unit cells covered by <block> as dirty if it
+        was <moved>.
+        """
+        if not moved:
+            return
+        path = block.path()
+        col, row, width = 0, 0, self._width
+        for i in path[len(path) - (block.level - self.board.level):]:
+            width //= 2
+            col += QUADRANT_OFFSETS[i][0] * width
+            row += QUADRANT_OFFSETS[i][1] * width
+        self._dirty.append((col, row, width))
+
+    def _refresh(self) -> None:
+        """Repaint the dirty squares and relabel every component that
+        touched them.
+        """
+        squares = self._dirty
+        self._dirty = []
+        self._paint(self.board, 0, 0, self._width, squares)
+
+        # A component that only touches a dirty square from outside may now
+        # join one inside it, so grow each square by one cell on every side.
+        seeds: Set[int] = set()
+        for col, row, width in squares:
+            left, right = max(col - 1, 0), min(col + width + 1, self._width)
+            for y in range(max(row - 1, 0), min(row + width + 1, self._width)):
+                start = padded_index(self._width, 0, y)
+                seeds.update(range(start + left, start + right))
+
+        stale = {self._labels[i] for i in seeds} - {-1}
+        for label in stale:
+            for i in self._members.pop(label):
+                self._labels[i] = -1
+                seeds.add(i)
+
+        for i in seeds:
+            if self._cells[i] and self._labels[i] == -1:
+                self._label_component(i)
+
+    def _paint(self, block: Block, col: int, row: int, width: int,
+               squares: List[Tuple[int, int, int]]) -> None:
+        """Copy the colours of <block>, whose square starts at (<col>, <row>)
+        and is <width> cells wide, into _cells wherever it overlaps one of
+        <squares>.
+        """
+        overlapping = [(c, r, w) for c, r, w in squares
+                       if c < col + width and col < c + w
+                       and r < row + width and row < r + w]
+        if not overlapping:
+            return
+
+        if block.children:
+            half = width // 2
+            for child, (dx, dy) in zip(block.children, QUADRANT_OFFSETS):
+                self._paint(child, col + dx * half, row + dy * half, half,
+                            overlapping)
+            return
+
+        value = block.colour == self.colour
+        for c, r, w in overlapping:
+            left, right = max(col, c), min(col + width, c + w)
+            for y in range(max(row, r), min(row + width, r + w)):
+                start = padded_index(self._width, 0, y)
+                self._cells[start + left:start + right] = \
+                    [value] * (right - left)
+
+    def _label_component(self, start: int) -> None:
+        """Give a fresh label to the component of the target colour that
+        contains cell <start>.
+        """
+        label = self._next_label
+        self._next_label += 1
+        self._members[label] = fill(self._cells, self._labels,
+                                    self._width + 1, start, label)
+
@@ -10,15 +10,128 @@ University of Toronto
 
 This file contains the Block class, the main data structure used in the game.
 """
-from typing import Optional, Tuple, List
+from typing import Callable, Dict, Generator, Iterator, Optional, Tuple, \
+    List, TYPE_CHECKING
 import random
 import math
-from app.renderer import COLOUR_LIST, TEMPTING_TURQUOISE, BLACK, colour_name
+from itertools import count
+from operator import add
+import numpy as np
+from app.renderer import COLOUR_LIST, TEMPTING_TURQUOISE, BLACK, colour_name, \
+    colour_index
+
+if TYPE_CHECKING:
+    from app.spatial_index import SpatialIndex
 
 
 HIGHLIGHT_COLOUR = TEMPTING_TURQUOISE
 FRAME_COLOUR = BLACK
 
+# The (column, row) offset, in halves of the parent, of each child of a Block,
+# in the order in which children are stored: upper-right, upper-left,
+# lower-left, lower-right.
+QUADRANT_OFFSETS = [(1, 0), (0, 0), (0, 1), (1, 1)]
+
+
+# Random keys for the structural hashes of Blocks, Zobrist-style.  They are
+# drawn from a private generator so that importing this module does not
+# disturb the seeded random module.
+_KEYS = random.Random(2017)
+_COLOUR_KEYS = {colour: _KEYS.getrandbits(64) for colour in COLOUR_LIST}
+_SLOT_KEYS = [_KEYS.getrandbits(64) for _ in range(4)]
+_HASH_MASK = 2 ** 64 - 1
+
+# The structural hashes of an undivided Block of each colour, as described in
+# Block, shared by all such Blocks.
+_LEAF_HASHES = {colour: (key,) * 4 for colour, key in _COLOUR_KEYS.items()}
+_NO_HASHES = (0,) * 4
+
+# The sides of a Block, for Block.side_count.
+TOP_SIDE, BOTTOM_SIDE, LEFT_SIDE, RIGHT_SIDE = 0, 1, 2, 3
+
+# The colour aggregates of an undivided Block of each colour, as described
+# in Block, shared by all such Blocks.
+_NUM_COLOURS = len(COLOUR_LIST)
+_LEAF_AGGREGATES = {
+    colour: (0, tuple(int(c == i) for c in range(_NUM_COLOURS)),
+             tuple(int(c == i) for c in range(_NUM_COLOURS)) * 4)
+    for i, colour in enumerate(COLOUR_LIST)}
+_NO_AGGREGATES = (0, (0,) * _NUM_COLOURS, (0,) * (4 * _NUM_COLOURS))
+
+# _TURNED_SIDES[t][i] is the index, in the sides of the colour aggregates of a
+# Block, of the count that moves to index i when the Block is turned clockwise
+# t times.  Each turn brings the left side to the top, the right side to the
+# bottom, the bottom side to the left and the top side to the right.
+_TURN_SOURCES = [LEFT_SIDE, RIGHT_SIDE, BOTTOM_SIDE, TOP_SIDE]
+_TURNED_SIDES = [list(range(4 * _NUM_COLOURS))]
+for _turns in range(3):
+    _TURNED_SIDES.append([
+        _TURNED_SIDES[-1][_TURN_SOURCES[i // _NUM_COLOURS] * _NUM_COLOURS
+                          + i % _NUM_COLOURS]
+        for i in range(4 * _NUM_COLOURS)])
+
+# The source of the generations of _Trees.  Drawing every generation from
+# one sequence keeps the generations of different trees distinct, so that a
+# Block moved from one tree into another never mistakes a stamp from its old
+# tree for a current one.
+_GENERATIONS = count()
+
+# The moves that can be made on a Block with Block.apply_move.
+ROTATE_CLOCKWISE = 'rotate_cw'
+ROTATE_COUNTERCLOCKWISE = 'rotate_ccw'
+SWAP_HORIZONTAL = 'swap_h'
+SWAP_VERTICAL = 'swap_v'
+SMASH = 'smash'
+
+# What Block.undo_move needs to reverse a move: the move to apply in its
+# place, and for a smash, the colour and children the Block had before.
+MoveToken = Tuple[Optional[str], Optional[Tuple[Optional[Tuple[int, int, int]],
+                                                List['Block']]]]
+
+# A rectangle to draw, as described in Block.rectangles_to_draw.
+Rectangle = Tuple[Tuple[int, int, int], Tuple[int, int], Tuple[int, int], int]
+
+
+class _Tree:
+    """The state shared by all of the Blocks in the tree under one root
+    Block, which is kept by the root and looked up by the Blocks below it.
+
+    Each board has its own _Tree, so that a move on one board leaves the
+    cached state of the Blocks of every other board valid.  It also holds
+    what only the root needs, so that the other Blocks need no room for it.
+
+    === Public Attributes ===
+    generation:
+        A number that changes whenever a Block in the tree is moved, or the
+        root is laid out by update_block_locations.  A Block records the
+        generation at which it was last exposed, as described in
+        Block._expose, and at which its position was last derived, so that
+        it need not look at its ancestors again until the tree changes.
+        It is None once the root has been given a parent, so that the
+        Blocks that still refer to this _Tree look up the new one.
+    index:
+        The SpatialIndex that answers get_selected_block for the root, once
+        it has been asked, or None.
+    """
+    __slots__ = ('generation', 'index')
+
+    generation: Optional[int]
+    index: Optional['SpatialIndex']
+
+    def __init__(self, generation: Optional[int]) -> None:
+        """Initialize this _Tree at <generation>, with no SpatialIndex."""
+        self.generation = generation
+        self.index = None
+
+    def advance(self) -> None:
+        """Move this tree on to a new generation."""
+        self.generation = next(_GENERATIONS)
+
+
+# The _Tree of every Block that has not looked up the _Tree of its root since
+# it was created.
+_UNKNOWN_TREE = _Tree(None)
+
 
 class Block:
     """A square block in the Blocky game.
@@ -50,6 +163,65 @@ class Block:
     parent:
         The block that this block is directly within.
 
+    === Private Attributes ===
+    _children:
+        The value behind the children property.  It may be out of date while
+        an ancestor of this Block has turns pending, as described for _turns.
+    _position, _size:
+        The values behind the position and size properties.  Those of the
+        top-level Block are set by update_block_locations.  Those of any other
+        Block are derived from its parent and its quadrant when they are
+        asked for, and kept until the next move.
+    _turns:
+        The number of clockwise quarter turns this Block has been rotated by
+        that have not yet been passed down to its children.  Rotating a Block
+        only adds to <_turns>; when the children are next needed, they are
+        reordered and each of them is given the turns in its own <_turns>.
+        It is always 0 for a Block without children.
+    _tree:
+        The _Tree of the root of this Block's tree, as last looked up by
+        _tree_of.  It is out of date, and has no generation, if it has not
+        been looked up since this Block was created or if that root has since
+        been given a parent.
+    _exposed_at:
+        The generation of this Block's tree when this Block and all its
+        ancestors were last seen to have no turns pending.
+    _placed_at:
+        The generation of this Block's tree when <_position> and <_size> were
+        last derived.
+    _observers:
+        Callbacks to notify whenever this Block or one of its descendants
+        is mutated by swap, rotate or smash or has its highlighting changed,
+        or None if there are none.
+    _highlighted:
+        The value of the highlighted property.
+    _hashes:
+        _hashes[t] is the structural hash of this Block turned clockwise t
+        more times, so _hashes[0] is the one returned by structural_hash, or
+        None if they must be recomputed from those of its children.
+        Keeping all four lets a turn be passed down to a child without
+        rehashing anything within it.  Undivided Blocks share the tuple of
+        their colour, and the others only compute theirs when a hash is
+        asked for.  They are cleared by swap, rotate and smash; a Block whose
+        children or colour are assigned directly must call _rehash.
+    _rects:
+        The position and size this Block had when rectangles_to_draw last
+        returned a list, paired with that list, or None if a move or a change
+        of highlighting within this Block has made it stale.  The list is
+        also stale if the position or size has changed since.
+    _aggregates:
+        A tuple (height, counts, sides) summarizing the colours in this
+        Block, or None if it must be recomputed from those of its children.
+        It is cleared by _rehash, so that a move only leaves the aggregates
+        of the Blocks it changed to recompute, and turned along with the
+        Block, so that a rotation leaves none.  <height> is the number of
+        levels from this Block down to its deepest descendant.  Both counts
+        are measured in units that split this Block into 4 ** height equal
+        squares, which does not depend on max_depth: counts[c] is the number
+        of those squares of colour COLOUR_LIST[c], and
+        sides[s * len(COLOUR_LIST) + c] is the number of them of that colour
+        along side s.
+
     === Representation Invariations ===
     - len(children) == 0 or len(children) == 4
     - If this Block has children,
@@ -63,14 +235,29 @@ class Block:
         - its colour is not None
     - level <= max_depth
     """
-    position: Tuple[int, int]
-    size: int
+    # Blocks are the bulk of a board's memory, so they have fixed slots in
+    # place of a per-instance __dict__.
+    __slots__ = ('_position', '_size', 'colour', 'level', 'max_depth',
+                 '_highlighted', '_children', 'parent', '_turns', '_tree',
+                 '_exposed_at', '_placed_at', '_observers', '_hashes',
+                 '_rects', '_aggregates')
+
     colour: Optional[Tuple[int, int, int]]
     level: int
     max_depth: int
-    highlighted: bool
-    children: List['Block']
     parent: Optional['Block']
+    _position: Tuple[int, int]
+    _size: int
+    _children: List['Block']
+    _turns: int
+    _tree: _Tree
+    _exposed_at: int
+    _placed_at: int
+    _observers: Optional[List[Callable[['Block', bool], None]]]
+    _highlighted: bool
+    _hashes: Optional[Tuple[int, int, int, int]]
+    _rects: Optional[Tuple[Tuple[Tuple[int, int], int], List[Rectangle]]]
+    _aggregates: Optional[Tuple[int, Tuple[int, ...], Tuple[int, ...]]]
 
     def __init__(self, level: int,
                  colour: Optional[Tuple[int, int, int]] = None,
@@ -84,26 +271,121 @@ class Block:
         and max_depth) to 0.  (All attributes can be updated later, as
         appropriate.)
         """
-        self.position = (0, 0)
-        self.size = 0
+        self._reset(level, colour, children)
+
+    def _reset(self, level: int, colour: Optional[Tuple[int, int, int]],
+               children: Optional[List['Block']]) -> None:
+        """Set every attribute of this Block as __init__ describes.
+        """
+        self._position = (0, 0)
+        self._size = 0
         self.level = level
         self.max_depth = 0
-        self.highlighted = False
+        self._highlighted = False
         self.parent = None
+        self._turns = 0
+        self._tree = _UNKNOWN_TREE
+        self._exposed_at = -1
+        self._placed_at = -1
+        self._observers = None
+        self._rects = None
 
         if children is None:
-            self.children = []
+            self._children = []
             self.colour = colour
         else:
-            self.children = children
+            self._children = children
             self.colour = None
-            for child in self.children:
+            for child in children:
                 child.parent = self
+                # El árbol del hijo deja de ser el de una raíz.
+                child._tree.generation = None
+        self._rehash()
+
+    @property
+    def children(self) -> List['Block']:
+        """The blocks into which this block is subdivided."""
+        if self._exposed_at != self._tree.generation:
+            self._expose()
+        return self._children
+
+    @children.setter
+    def children(self, children: List['Block']) -> None:
+        """Replace the children of this block, without setting their parent.
+        """
+        self._children = children
+        self._turns = 0
+        self._tree_of().advance()
+
+    @property
+    def position(self) -> Tuple[int, int]:
+        """The (x, y) coordinates of the upper left corner of this Block."""
+        if self._placed_at != self._tree.generation:
+            self._place()
+        return self._position
+
+    @property
+    def size(self) -> int:
+        """The height and width of this Block."""
+        if self._placed_at != self._tree.generation:
+            self._place()
+        return self._size
+
+    def _place(self) -> None:
+        """Derive the position and size of this Block from those of its
+        parent and the quadrant of the parent it is in.
+
+        A Block that is no longer among its parent's children, having been
+        smashed away, keeps the position it had.
+        """
+        generation = self._tree_of().generation
+        parent = self.parent
+        if parent is not None:
+            if parent._exposed_at != generation:
+                parent._expose()
+            if parent._placed_at != generation:
+                parent._place()
+            siblings = parent._children
+            for i in range(len(siblings)):
+                if siblings[i] is self:
+                    x, y = parent._position
+                    half = parent._size // 2
+                    dx, dy = QUADRANT_OFFSETS[i]
+                    self._position = (x + dx * half, y + dy * half)
+                    self._size = half
+                    break
+        self._placed_at = generation
+
+    def _tree_of(self) -> _Tree:
+        """Return the _Tree of the root of this Block's tree, looking it up
+        from the root if the one recorded on this Block is out of date.
+        """
+        tree = self._tree
+        if tree.generation is None:
+            # Se busca desde el padre, para que cada ancestro guarde también
+            # el árbol encontrado.
+            if self.parent is not None:
+                tree = self.parent._tree_of()
+            else:
+                tree = _Tree(next(_GENERATIONS))
+            self._tree = tree
+        return tree
+
+    @property
+    def highlighted(self) -> bool:
+        """True iff the user has selected this block for action."""
+        return self._highlighted
+
+    @highlighted.setter
+    def highlighted(self, value: bool) -> None:
+        """Select or deselect this block, notifying observers if that
+        changes anything.
+        """
+        if value != self._highlighted:
+            self._highlighted = value
+            self._notify(False)
 
-    def rectangles_to_draw(self) -> List[Tuple[Tuple[int, int, int],
-                                               Tuple[int, int],
-                                               Tuple[int, int],
-                                               int]]:
+    def rectangles_to_draw(self) -> List[Rectangle]:
         """
         Return a list of tuples describing all of the rectangles to be drawn
         in order to render this Block.
@@ -129,26 +411,57 @@ class Block:
           the outline.
 
         The order of the rectangles does not matter.
-        """
-        rects = []
-        x, y = self.position
-        size = self.size
 
-        if not self.children:
-            # Agregar el rectángulo del color del bloque
-            rects.append((self.colour, (x, y), (size, size), 0))
-            # Agregar el marco del bloque
-            rects.append((FRAME_COLOUR, (x, y), (size, size), 3))
-        else:
-            # Recursivamente agregar los rectángulos de los hijos
-            for child in self.children:
-                rects.extend(child.rectangles_to_draw())
+        The list is cached on this Block until a move or a change of
+        highlighting within it, or a change of its position or size, so it
+        must not be modified.
+        """
+        at = (self.position, self.size)
+        if self._rects is None or self._rects[0] != at:
+            self._rects = (at, list(self.iter_rectangles()))
+        return self._rects[1]
 
-        if self.highlighted:
-            # Agregar el marco de resaltado si el bloque está resaltado
-            rects.append((HIGHLIGHT_COLOUR, (x, y), (size, size), 5))
+    def iter_rectangles(self) -> Iterator[Rectangle]:
+        """Yield the rectangles returned by rectangles_to_draw, in the same
+        order, without building a list for each Block.
 
-        return rects
+        The cached lists of Blocks within this one are reused where they are
+        still valid.
+        """
+        if self._exposed_at != self._tree.generation:
+            self._expose()
+        # La pila guarda bloques por visitar, con su posición y tamaño
+        # calculados a partir de los del padre, y marcos de resaltado por
+        # emitir después de los hijos de su bloque.
+        stack: List[object] = [(self, self.position, self.size)]
+        while stack:
+            item = stack.pop()
+            if len(item) == 4:
+                yield item
+                continue
+            item, position, size = item
+            if item._rects is not None and \
+                    item._rects[0] == (position, size):
+                yield from item._rects[1]
+                continue
+
+            x, y = position
+            if item._highlighted:
+                # Agregar el marco de resaltado si el bloque está resaltado
+                stack.append((HIGHLIGHT_COLOUR, (x, y), (size, size), 5))
+            if not item._children:
+                # Agregar el rectángulo del color del bloque y su marco
+                yield (item.colour, (x, y), (size, size), 0)
+                yield (FRAME_COLOUR, (x, y), (size, size), 3)
+            else:
+                if item._turns:
+                    item._settle()
+                half = size // 2
+                children = item._children
+                for i in range(len(children) - 1, -1, -1):
+                    dx, dy = QUADRANT_OFFSETS[i]
+                    stack.append((children[i], (x + dx * half, y + dy * half),
+                                  half))
 
     def swap(self, direction: int) -> None:
         """Swap the child Blocks of this Block.
@@ -156,35 +469,82 @@ class Block:
         If <direction> is 1, swap vertically. If <direction> is 0, swap
         horizontally. If this Block has no children, do nothing.
         """
-        if not self.children:
+        children = self.children
+        if not children:
             return
 
         if direction == 0:  # Horizontal swap
-            self.children[0], self.children[1] = self.children[1], self.children[0]
-            self.children[2], self.children[3] = self.children[3], self.children[2]
+            children[0], children[1] = children[1], children[0]
+            children[2], children[3] = children[3], children[2]
         elif direction == 1:  # Vertical swap
-            self.children[0], self.children[2] = self.children[2], self.children[0]
-            self.children[1], self.children[3] = self.children[3], self.children[1]
+            children[0], children[2] = children[2], children[0]
+            children[1], children[3] = children[3], children[1]
 
-        self.update_block_locations(self.position, self.size)
+        self._notify()
 
     def rotate(self, direction: int) -> None:
-        """Rotate this Block and all its descendants."""
+        """Rotate this Block and all its descendants.
+
+        If <direction> is 1, rotate clockwise.  If <direction> is 3 (or -1),
+        rotate counterclockwise.  If this Block has no children, do nothing.
+
+        The descendants are not rotated right away: the rotation is recorded
+        on this Block and passed down one level at a time as the Blocks below
+        are needed, so a rotation takes constant time.
+        """
         if not self.children:
             return
 
-        # Reordenar los hijos según la dirección de rotación
         if direction == 1:  # Rotación en sentido horario
-            self.children = [self.children[3], self.children[0], self.children[1], self.children[2]]
-        elif direction == -1:  # Rotación en sentido antihorario
-            self.children = [self.children[1], self.children[2], self.children[3], self.children[0]]
+            self._turn(1)
+        elif direction in (3, -1):  # Rotación en sentido antihorario
+            self._turn(3)
+        self._notify()
 
-        # Actualizar las posiciones y tamaños de los bloques hijos
-        self.update_block_locations(self.position, self.size)
+    def _turn(self, turns: int) -> None:
+        """Turn this Block clockwise <turns> times, by recording the turns to
+        be passed down to its children when they are next needed.
 
-        # Aplicar la rotación recursivamente a los hijos
-        for child in self.children:
-            child.rotate(direction)
+        Precondition: 0 <= turns < 4
+        """
+        if not self._children or not turns:
+            return
+        self._turns = (self._turns + turns) % 4
+        if self._hashes is not None:
+            self._hashes = self._hashes[turns:] + self._hashes[:turns]
+        if self._aggregates is not None:
+            height, counts, sides = self._aggregates
+            self._aggregates = (height, counts,
+                                tuple(sides[i] for i in _TURNED_SIDES[turns]))
+        self._rects = None
+
+    def _settle(self) -> None:
+        """Pass the turns pending on this Block down to its children."""
+        turns = self._turns
+        # Un giro horario lleva cada hijo al cuadrante anterior.
+        children = self._children[turns:] + self._children[:turns]
+        self._children = children
+        self._turns = 0
+        for child in children:
+            child._turn(turns)
+
+    def _expose(self) -> None:
+        """Settle this Block and each of its ancestors that needs it, from
+        the top down, so that the children, hashes and colour aggregates of
+        this Block are all up to date.
+
+        This Block then records the current generation of its tree, and need
+        not be exposed again until another move is made within the tree.
+        """
+        generation = self._tree.generation
+        if generation is None:
+            generation = self._tree_of().generation
+        parent = self.parent
+        if parent is not None and parent._exposed_at != generation:
+            parent._expose()
+        if self._turns:
+            self._settle()
+        self._exposed_at = generation
 
     def smash(self) -> bool:
         """Smash this block.
@@ -201,17 +561,291 @@ class Block:
         if self.parent is None or self.level == self.max_depth:
             return False
 
-        self.children = []
+        children = []
         for _ in range(4):
-            child = Block(self.level + 1, random.choice(COLOUR_LIST))
+            child = POOL.acquire(self.level + 1, random.choice(COLOUR_LIST))
             child.max_depth = self.max_depth
             child.parent = self
-            self.children.append(child)
+            children.append(child)
 
+        self.children = children
         self.colour = None
-        self.update_block_locations(self.position, self.size)
+        self._notify()
         return True
 
+    def apply_move(self, move: str) -> 'MoveToken':
+        """Apply <move> to this Block and return a token with which
+        undo_move can reverse it.
+
+        <move> is one of ROTATE_CLOCKWISE, ROTATE_COUNTERCLOCKWISE,
+        SWAP_HORIZONTAL, SWAP_VERTICAL and SMASH.
+        """
+        if move == ROTATE_CLOCKWISE:
+            self.rotate(1)
+            return ROTATE_COUNTERCLOCKWISE, None
+        elif move == ROTATE_COUNTERCLOCKWISE:
+            self.rotate(3)
+            return ROTATE_CLOCKWISE, None
+        elif move == SWAP_HORIZONTAL:
+            self.swap(0)
+            return SWAP_HORIZONTAL, None
+        elif move == SWAP_VERTICAL:
+            self.swap(1)
+            return SWAP_VERTICAL, None
+
+        colour, children = self.colour, self.children
+        if self.smash():
+            return SMASH, (colour, children)
+        return None, None
+
+    def undo_move(self, token: 'MoveToken') -> None:
+        """Reverse the move that returned <token> when applied to this Block.
+
+        Moves must be undone in the reverse of the order they were applied.
+        Undoing a smash gives the Blocks it created back to POOL, so they
+        must not be used afterwards.
+        """
+        move, saved = token
+        if move == SMASH:
+            # Los giros pendientes de los ancestros se aplican antes, porque
+            # los hijos guardados ya los tenían en cuenta.
+            if self._exposed_at != self._tree.generation:
+                self._expose()
+            discarded = self._children
+            self.colour, self.children = saved
+            self._notify()
+            for child in discarded:
+                POOL.release(child)
+        elif move is not None:
+            self.apply_move(move)
+
+    def moves(self, include_smash: bool = False
+              ) -> Iterator[Tuple['Block', str]]:
+        """Yield each distinct move that can be made within this Block, as
+        the Block to move and the move to apply to it, exactly once.
+
+        Moves that provably leave the board unchanged are skipped: rotating
+        or swapping a Block without children, rotating a Block of a single
+        colour, and swapping children whose contents are identical.  Smashes
+        are included only if <include_smash> is True.
+        """
+        yield from self._moves({}, include_smash)
+
+    def _moves(self, signatures: Dict[Tuple[int, ...], int],
+               include_smash: bool
+               ) -> Generator[Tuple['Block', str], None, int]:
+        """Yield the moves within this Block as described in moves(), children
+        first, and return a signature of the contents of this Block.
+
+        Two Blocks at the same level have the same signature iff they flatten
+        to the same cells.  A Block of a single colour has the negative
+        signature -1 - colour_index(colour); any other Block has a
+        non-negative signature, assigned through <signatures>.
+        """
+        if include_smash and self.parent is not None \
+                and self.level != self.max_depth:
+            yield self, SMASH
+
+        if not self.children:
+            return -1 - colour_index(self.colour)
+
+        sigs = []
+        for child in self.children:
+            sig = yield from child._moves(signatures, include_smash)
+            sigs.append(sig)
+        if sigs[0] < 0 and sigs.count(sigs[0]) == 4:
+            return sigs[0]
+
+        yield self, ROTATE_CLOCKWISE
+        yield self, ROTATE_COUNTERCLOCKWISE
+        if sigs[0] != sigs[1] or sigs[2] != sigs[3]:
+            yield self, SWAP_HORIZONTAL
+        if sigs[0] != sigs[2] or sigs[1] != sigs[3]:
+            yield self, SWAP_VERTICAL
+        return signatures.setdefault(tuple(sigs), len(signatures))
+
+    def add_observer(self, observer: Callable[['Block', bool], None]) -> None:
+        """Register <observer> to be called whenever this Block or one of its
+        descendants changes.
+
+        <observer> is called with the Block that changed and True if that
+        Block was swapped, rotated or smashed, or False if only its
+        highlighting changed.
+        """
+        if self._observers is None:
+            self._observers = []
+        self._observers.append(observer)
+
+    def remove_observer(self,
+                        observer: Callable[['Block', bool], None]) -> None:
+        """Stop notifying <observer> about mutations within this Block.
+
+        Do nothing if <observer> was never registered.
+        """
+        if self._observers is not None and observer in self._observers:
+            self._observers.remove(observer)
+            if not self._observers:
+                self._observers = None
+
+    def _notify(self, moved: bool = True) -> None:
+        """Report a change to this Block to the observers of this Block and
+        of each of its ancestors.
+
+        <moved> is True if this Block was swapped, rotated or smashed, in
+        which case the structural hashes and colour aggregates of this Block
+        and its ancestors are cleared first, and False if only its
+        highlighting changed.  Either way, their cached rectangles are
+        dropped.
+        """
+        if moved:
+            self._tree_of().advance()
+        observers = []
+        block = self
+        while block is not None:
+            block._rects = None
+            if moved:
+                block._rehash()
+            if block._observers is not None:
+                observers.extend(block._observers)
+            block = block.parent
+        for observer in observers:
+            observer(self, moved)
+
+    def structural_hash(self) -> int:
+        """Return a 64-bit hash of the arrangement and colours of the Blocks
+        within this Block.
+
+        Blocks with the same children, in the same order, and the same colours
+        have the same hash, wherever they are in the board.  It is computed
+        incrementally: after a move, only the moved Block and its ancestors
+        are rehashed.
+        """
+        if self._exposed_at != self._tree.generation:
+            self._expose()
+        return self._structural_hashes()[0]
+
+    def _structural_hashes(self) -> Tuple[int, int, int, int]:
+        """Return the structural hashes of this Block, recomputing those of
+        this Block and the Blocks within it that have been cleared.
+
+        Precondition: no ancestor of this Block has turns pending.
+        """
+        if self._hashes is not None:
+            return self._hashes
+        # Basta con asentar este bloque: los hashes no dependen de sus
+        # ancestros.
+        if self._turns:
+            self._settle()
+        # Girado t veces, el cuadrante i contiene al hijo (i + t) % 4
+        # girado t veces.
+        a, b, c, d = [child._structural_hashes() for child in self._children]
+        self._hashes = (_combine(a[0], b[0], c[0], d[0]),
+                        _combine(b[1], c[1], d[1], a[1]),
+                        _combine(c[2], d[2], a[2], b[2]),
+                        _combine(d[3], a[3], b[3], c[3]))
+        return self._hashes
+
+    def colour_count(self, colour: Tuple[int, int, int]) -> int:
+        """Return the number of unit cells of <colour> in this Block.
+        """
+        height, counts, _ = self._colour_aggregates()
+        return counts[colour_index(colour)] \
+            << 2 * (self.max_depth - self.level - height)
+
+    def side_count(self, side: int, colour: Tuple[int, int, int]) -> int:
+        """Return the number of unit cells of <colour> along <side> of this
+        Block, which is one of TOP_SIDE, BOTTOM_SIDE, LEFT_SIDE and
+        RIGHT_SIDE.
+        """
+        height, _, sides = self._colour_aggregates()
+        return sides[side * _NUM_COLOURS + colour_index(colour)] \
+            << self.max_depth - self.level - height
+
+    def border_count(self, colour: Tuple[int, int, int]) -> int:
+        """Return the number of unit cells of <colour> along the four sides
+        of this Block.  Corner cells count once for each side.
+        """
+        height, _, sides = self._colour_aggregates()
+        i = colour_index(colour)
+        return sum(sides[i::_NUM_COLOURS]) \
+            << self.max_depth - self.level - height
+
+    def uniform_colour(self) -> Optional[Tuple[int, int, int]]:
+        """Return the colour of every unit cell in this Block if they all
+        have the same colour, and None otherwise.
+        """
+        counts = self._colour_aggregates()[1]
+        for i in range(_NUM_COLOURS):
+            if counts[i]:
+                return COLOUR_LIST[i] if sum(counts) == counts[i] else None
+        return None
+
+    def _colour_aggregates(self) -> Tuple[int, Tuple[int, ...],
+                                          Tuple[int, ...]]:
+        """Return the colour aggregates of this Block, recomputing those of
+        this Block and the Blocks within it that have been cleared.
+        """
+        if self._exposed_at != self._tree.generation:
+            self._expose()
+        if self._aggregates is not None:
+            return self._aggregates
+
+        # Los agregados de cada hijo se reescalan a la altura de este bloque.
+        children = [child._colour_aggregates() for child in self.children]
+        height = 1 + max(child[0] for child in children)
+        counts, borders = [], []
+        for child_height, child_counts, child_border in children:
+            shift = height - 1 - child_height
+            if shift:
+                child_counts = [n << 2 * shift for n in child_counts]
+                child_border = [n << shift for n in child_border]
+            counts.append(child_counts)
+            borders.append(child_border)
+
+        n = _NUM_COLOURS
+        ur, ul, ll, lr = borders
+        self._aggregates = (
+            height,
+            tuple(map(sum, zip(*counts))),
+            tuple(map(add, ur[:n], ul[:n])) +
+            tuple(map(add, ll[n:2 * n], lr[n:2 * n])) +
+            tuple(map(add, ul[2 * n:3 * n], ll[2 * n:3 * n])) +
+            tuple(map(add, ur[3 * n:], lr[3 * n:])))
+        return self._aggregates
+
+    def _rehash(self) -> None:
+        """Reset the structural hashes and colour aggregates of this Block to
+        those shared by undivided Blocks of its colour, or if it has
+        children, clear them to be recomputed when next asked for.  Drop its
+        cached rectangles.
+        """
+        self._rects = None
+        if not self._children:
+            self._hashes = _LEAF_HASHES.get(self.colour, _NO_HASHES)
+            self._aggregates = _LEAF_AGGREGATES.get(self.colour,
+                                                    _NO_AGGREGATES)
+        else:
+            self._hashes = None
+            self._aggregates = None
+
+    def path(self) -> List[int]:
+        """Return the indices into <children> that lead from the root of the
+        tree containing this Block down to this Block.
+
+        The root itself has the empty path.
+        """
+        indices = []
+        block = self
+        while block.parent is not None:
+            siblings = block.parent.children
+            for i in range(len(siblings)):
+                if siblings[i] is block:
+                    indices.append(i)
+                    break
+            block = block.parent
+        indices.reverse()
+        return indices
+
     def update_block_locations(self, top_left: Tuple[int, int],
                                size: int) -> None:
         """
@@ -222,27 +856,33 @@ class Block:
 
         <top_left> is the (x, y) coordinates of the top left corner of
         this Block.  <size> is the height and width of this Block.
-        """
-        self.position = top_left
-        self.size = size
-
-        if self.children:
-            half = size // 2
-
-            positions = [
-                (top_left[0] + half, top_left[1]),  # Arriba derecha
-                (top_left[0], top_left[1]),  # Arriba izquierda
-                (top_left[0], top_left[1] + half),  # Abajo izquierda
-                (top_left[0] + half, top_left[1] + half)  # Abajo derecha
-            ]
-
 
-            for child, pos in zip(self.children, positions):
-                child.update_block_locations(pos, half)
+        Only this Block is updated right away.  The Blocks within it derive
+        their positions and sizes from it when they are asked for, so this
+        takes constant time.  Precondition: this is the top-level Block, since
+        the position of any other Block follows from its parent's.
+        """
+        tree = self._tree_of()
+        tree.advance()
+        self._position = top_left
+        self._size = size
+        self._placed_at = tree.generation
 
     def get_selected_block(self, location: Tuple[int, int], level: int) -> 'Block':
         """Return the Block within this Block that includes the given location
-        and is at the given level."""
+        and is at the given level.
+
+        On a root Block, the answer comes from a SpatialIndex that is built
+        on the first call and kept up to date as the board is mutated.
+        """
+        if self.parent is None and level >= self.level:
+            tree = self._tree_of()
+            if tree.index is None:
+                # Importado aquí porque spatial_index importa este módulo.
+                from app.spatial_index import SpatialIndex
+                tree.index = SpatialIndex(self)
+            return tree.index.find(location, level)
+
         x, y = location
         if level == self.level or not self.children:
             return self
@@ -273,25 +913,133 @@ class Block:
         """
         size = int(2 ** (self.max_depth - self.level))
 
-        if not self.children:
+        children = self.children
+        if not children:
             return [[self.colour for _ in range(size)] for _ in range(size)]
 
         # Flatten children
-        ur = self.children[0].flatten()
-        ul = self.children[1].flatten()
-        ll = self.children[2].flatten()
-        lr = self.children[3].flatten()
+        ur = children[0].flatten()
+        ul = children[1].flatten()
+        ll = children[2].flatten()
+        lr = children[3].flatten()
+
+        half = size // 2
+
+        # Left columns: UL above LL
+        left_columns = [ul[i] + ll[i] for i in range(half)]
+
+        # Right columns: UR above LR
+        right_columns = [ur[i] + lr[i] for i in range(half)]
+
+        return left_columns + right_columns
+
+    def flatten_array(self) -> np.ndarray:
+        """Return a two-dimensional array representing this Block as columns
+        and rows of unit cells.
+
+        Return a 2^{max_depth - self.level} square array A of dtype uint8,
+        where A[i, j] is the index into COLOUR_LIST of the colour of the unit
+        cell at column i and row j.  This is the same layout as flatten(),
+        but with colour indices in place of colour tuples.  BlobIndex, and so
+        BlobGoal and the players that score with it, and ScoreTable read
+        boards in this form.
+        """
+        size = 2 ** (self.max_depth - self.level)
+        grid = np.empty((size, size), dtype=np.uint8)
+        self._fill_array(grid, 0, 0, size)
+        return grid
+
+    def _fill_array(self, grid: np.ndarray, col: int, row: int,
+                    size: int) -> None:
+        """Write the colour indices of this Block into the <size> by <size>
+        square of <grid> whose upper-left cell is at (<col>, <row>).
+        """
+        if not self.children:
+            grid[col:col + size, row:row + size] = colour_index(self.colour)
+            return
 
         half = size // 2
+        for child, (dx, dy) in zip(self.children, QUADRANT_OFFSETS):
+            child._fill_array(grid, col + dx * half, row + dy * half, half)
+
 
-        # Top rows: UR + UL
-        top_rows = [ul[i] + ur[i] for i in range(half)]
 
-        # Bottom rows: LL + LR
-        bottom_rows = [ll[i] + lr[i] for i in range(half)]
+class BlockPool:
+    """A free list of Blocks that are no longer part of any board, reused
+    in place of new Blocks.
 
-        return top_rows + bottom_rows
+    Smashing a Block and undoing the smash, as a search does for every
+    candidate smash, would otherwise leave four Blocks for the garbage
+    collector each time.
 
+    === Public Attributes ===
+    limit:
+        The largest number of Blocks kept for reuse.  Blocks released beyond
+        it are left to the garbage collector.
+    """
+    # === Private Attributes ===
+    # _free:
+    #     The Blocks ready to be reused.
+    limit: int
+    _free: List[Block]
+
+    def __init__(self, limit: int = 1 << 16) -> None:
+        """Initialize this BlockPool with no Blocks in it."""
+        self.limit = limit
+        self._free = []
+
+    def __len__(self) -> int:
+        """Return the number of Blocks ready to be reused."""
+        return len(self._free)
+
+    def acquire(self, level: int,
+                colour: Optional[Tuple[int, int, int]] = None,
+                children: Optional[List[Block]] = None) -> Block:
+        """Return a Block initialized as Block(<level>, <colour>,
+        <children>) would be, reusing a released Block if there is one.
+        """
+        if not self._free:
+            return Block(level, colour, children)
+        block = self._free.pop()
+        block._reset(level, colour, children)
+        return block
+
+    def release(self, block: Block) -> None:
+        """Give <block> and every Block within it to this pool for reuse.
+
+        Precondition: <block> has been removed from its board, and nothing
+        else, such as a goal, an index or a move token, refers to it or to
+        any Block within it.
+        """
+        free = self._free
+        stack = [block]
+        while stack:
+            block = stack.pop()
+            stack.extend(block._children)
+            # Se sueltan las referencias para no retener otros bloques.
+            block._children = []
+            block.parent = None
+            block._tree = _UNKNOWN_TREE
+            block._observers = None
+            block._rects = None
+            if len(free) < self.limit:
+                free.append(block)
+
+
+# The BlockPool used by Block.smash, Block.undo_move and deserialize.
+POOL = BlockPool()
+
+
+def _combine(ur: int, ul: int, ll: int, lr: int) -> int:
+    """Return the structural hash of a Block whose children, in the order
+    they are stored, have the hashes <ur>, <ul>, <ll> and <lr>.
+    """
+    ur = (ur ^ _SLOT_KEYS[0]) * 0x9E3779B97F4A7C15 & _HASH_MASK
+    ul = (ul ^ _SLOT_KEYS[1]) * 0x9E3779B97F4A7C15 & _HASH_MASK
+    ll = (ll ^ _SLOT_KEYS[2]) * 0x9E3779B97F4A7C15 & _HASH_MASK
+    lr = (lr ^ _SLOT_KEYS[3]) * 0x9E3779B97F4A7C15 & _HASH_MASK
+    return (ur ^ (ur >> 29) ^ ul ^ (ul >> 29) ^
+            ll ^ (ll >> 29) ^ lr ^ (lr >> 29))
 
 
 def random_init(level: int, max_depth: int) -> 'Block':
@@ -307,11 +1055,13 @@ def random_init(level: int, max_depth: int) -> 'Block':
     """
     if level == max_depth or random.random() > 0.5:
         # Crear un bloque sin hijos con un color aleatorio
-        return Block(level, random.choice(COLOUR_LIST))
+        block = Block(level, random.choice(COLOUR_LIST))
     else:
         # Crear un bloque con cuatro hijos
         children = [random_init(level + 1, max_depth) for _ in range(4)]
-        return Block(level, children=children)
+        block = Block(level, children=children)
+    block.max_depth = max_depth
+    return block
 
 
 def attributes_str(b: Block, verbose) -> str:
@@ -0,0 +1,127 @@
+"""Assignment 2 - Blocky
+
+=== CSC148 Fall 2017 ===
+Diane Horton and David Liu
+Department of Computer Science,
+University of Toronto
+
+
+=== Module Description ===
+
+This file contains the BoardBatch class, which generates many random boards
+at once and builds the Block tree of a board only when it is asked for.
+
+A batch is generated one level at a time: the split decisions and colours
+of every Block at a level, across all of the boards, are drawn together from
+a seeded NumPy generator.  Each board is kept in level order: the Blocks at
+each level are listed left to right, and the four children of a subdivided
+Block appear together, in the order of Block.children, at the next level.
+That costs two bytes per Block instead of a Block object.
+"""
+from typing import Callable, List, Optional, Tuple
+import numpy as np
+from app.block import Block
+from app.game import split_probability
+from app.renderer import COLOUR_LIST
+
+
+class BoardBatch:
+    """A batch of randomly-generated boards, stored in level order.
+
+    === Public Attributes ===
+    max_depth:
+        The maximum depth of every board in the batch.
+
+    === Representation Invariants ===
+    - len(self._splits) == len(self._colours) == len(self._starts)
+    - for each level, the Blocks of board i are
+      self._splits[level][self._starts[level][i]:self._starts[level][i + 1]]
+    - no Block at max_depth is subdivided
+    """
+    # === Private Attributes ===
+    # _splits:
+    #     For each level, whether each Block at that level is subdivided.
+    # _colours:
+    #     For each level, the index in COLOUR_LIST of the colour of each
+    #     Block at that level; ignored for subdivided Blocks.
+    # _starts:
+    #     For each level, the index of the first Block of each board in the
+    #     arrays of that level, followed by the number of Blocks at the level.
+    max_depth: int
+    _splits: List[np.ndarray]
+    _colours: List[np.ndarray]
+    _starts: List[np.ndarray]
+
+    def __init__(self, count: int, max_depth: int, seed: Optional[int] = None,
+                 probability: Callable[[int], float] = split_probability
+                 ) -> None:
+        """Generate <count> random boards subdivided to a maximum depth of
+        <max_depth>, drawing from a NumPy generator seeded with <seed>.
+
+        A Block at level l above max_depth is subdivided with probability
+        <probability>(l).  The default is the rule of app.game.random_init;
+        pass lambda level: 0.5 for the rule of app.block.random_init.
+        """
+        self.max_depth = max_depth
+        self._splits = []
+        self._colours = []
+        self._starts = []
+        rng = np.random.default_rng(seed)
+        counts = np.ones(count, dtype=np.int64)
+        for level in range(max_depth + 1):
+            starts = np.zeros(count + 1, dtype=np.int64)
+            np.cumsum(counts, out=starts[1:])
+            total = int(starts[-1])
+            if total == 0 and self._starts:
+                break
+            if level < max_depth:
+                splits = rng.random(total) < probability(level)
+            else:
+                splits = np.zeros(total, dtype=bool)
+            self._splits.append(splits)
+            self._colours.append(rng.integers(0, len(COLOUR_LIST), total,
+                                              dtype=np.uint8))
+            self._starts.append(starts)
+            # Cada bloque subdividido aporta cuatro bloques al nivel siguiente
+            split_before = np.zeros(total + 1, dtype=np.int64)
+            np.cumsum(splits, out=split_before[1:])
+            counts = 4 * (split_before[starts[1:]] - split_before[starts[:-1]])
+
+    def __len__(self) -> int:
+        """Return the number of boards in this batch."""
+        return len(self._starts[0]) - 1
+
+    def num_blocks(self, i: int) -> int:
+        """Return the number of Blocks in board <i> of this batch."""
+        return sum(int(starts[i + 1] - starts[i]) for starts in self._starts)
+
+    def board(self, i: int, top_left: Tuple[int, int] = (0, 0),
+              size: int = 0) -> Block:
+        """Return a new Block tree for board <i> of this batch.
+
+        Lay the board out with its upper-left corner at <top_left> and the
+        given <size>, using update_block_locations.
+        """
+        if not -len(self) <= i < len(self):
+            raise IndexError('board index out of range')
+        i %= len(self)
+        below: List[Block] = []
+        for level in range(len(self._starts) - 1, -1, -1):
+            start, end = self._starts[level][i], self._starts[level][i + 1]
+            splits = self._splits[level][start:end].tolist()
+            colours = self._colours[level][start:end].tolist()
+            blocks = []
+            next_child = 0
+            for split, colour in zip(splits, colours):
+                if split:
+                    block = Block(level,
+                                  children=below[next_child:next_child + 4])
+                    next_child += 4
+                else:
+                    block = Block(level, COLOUR_LIST[colour])
+                block.max_depth = self.max_depth
+                blocks.append(block)
+            below = blocks
+        board = below[0]
+        board.update_block_locations(top_left, size)
+        return board
@@ -0,0 +1,133 @@
+"""Assignment 2 - Blocky
+
+=== CSC148 Fall 2017 ===
+Diane Horton and David Liu
+Department of Computer Science,
+University of Toronto
+
+
+=== Module Description ===
+
+This file contains an iterative flood fill over flat grids of unit cells,
+used to find the blobs for BlobGoal and BlobIndex.  It uses an explicit
+stack, so the size of a blob is not limited by Python's recursion limit.
+
+A board <width> cells wide is stored as a padded grid: a flat list holding
+one row of padding, then each row of cells followed by one padding cell, then
+one more row of padding.  Rows are therefore <width> + 1 apart (the stride),
+and the cell in column c and row r is at index (r + 1) * stride + c.  Padding
+cells are never of the target colour, so every cell of the board has its
+neighbours at i - 1, i + 1, i - stride and i + stride, with no bounds checks.
+"""
+from typing import List
+import numpy as np
+
+
+def padded_index(width: int, col: int, row: int) -> int:
+    """Return the index of the cell in column <col> and row <row> in a
+    padded grid for a board <width> cells wide.
+    """
+    return (row + 1) * (width + 1) + col
+
+
+def padded_mask(grid: np.ndarray, target: int) -> List[bool]:
+    """Return the padded grid whose cells are True iff they have the colour
+    index <target> in <grid>, as returned by Block.flatten_array.
+    """
+    return _padded_array(grid, target).tolist()
+
+
+def fill(cells: List[bool], labels: List[int], stride: int, start: int,
+         label: int) -> List[int]:
+    """Mark every cell connected to cell <start> through cells of the target
+    colour with <label> in <labels>, and return the list of those cells.
+
+    <cells> and <labels> are padded grids with the given <stride>.  cells[i]
+    is True iff cell i has the target colour, and labels[i] is -1 iff cell i
+    has not yet been given a label.
+
+    Precondition: cells[start] and labels[start] == -1
+    """
+    labels[start] = label
+    members = [start]
+    stack = [start]
+    while stack:
+        i = stack.pop()
+        for j in (i - 1, i + 1, i - stride, i + stride):
+            if cells[j] and labels[j] == -1:
+                labels[j] = label
+                members.append(j)
+                stack.append(j)
+    return members
+
+
+def largest_blob(grid: np.ndarray, target: int) -> int:
+    """Return the number of cells in the largest connected blob of cells
+    with the colour index <target> in <grid>, as returned by
+    Block.flatten_array.
+    """
+    mask = _padded_array(grid, target)
+    cells = mask.tolist()
+    stride = len(grid) + 1
+    largest = 0
+    # Las celdas visitadas se apagan en <cells>, así que no hacen falta
+    # etiquetas.
+    for start in np.flatnonzero(mask).tolist():
+        if not cells[start]:
+            continue
+        cells[start] = False
+        size = 0
+        stack = [start]
+        while stack:
+            i = stack.pop()
+            size += 1
+            for j in (i - 1, i + 1, i - stride, i + stride):
+                if cells[j]:
+                    cells[j] = False
+                    stack.append(j)
+        largest = max(largest, size)
+    return largest
+
+
+def largest_blobs(grid: np.ndarray, num_colours: int) -> List[int]:
+    """Return a list whose item i is the number of cells in the largest
+    connected blob of cells with the colour index i in <grid>, as returned
+    by Block.flatten_array, for each i < <num_colours>.
+
+    Every colour is measured in the same pass over the grid.
+    """
+    width = len(grid)
+    padded = np.full((width + 2, width + 1), -1, dtype=np.int16)
+    padded[1:-1, :-1] = grid.T
+    cells = padded.ravel().tolist()
+    stride = width + 1
+    largest = [0] * num_colours
+    # Cada celda visitada pasa a -1, como el relleno, así que una mancha
+    # sólo se recorre una vez.
+    for start in range(stride, len(cells) - stride):
+        colour = cells[start]
+        if colour < 0:
+            continue
+        cells[start] = -1
+        size = 0
+        stack = [start]
+        while stack:
+            i = stack.pop()
+            size += 1
+            for j in (i - 1, i + 1, i - stride, i + stride):
+                if cells[j] == colour:
+                    cells[j] = -1
+                    stack.append(j)
+        if size > largest[colour]:
+            largest[colour] = size
+    return largest
+
+
+def _padded_array(grid: np.ndarray, target: int) -> np.ndarray:
+    """Return padded_mask(grid, target) as a flat numpy array."""
+    width = len(grid)
+    mask = np.zeros((width + 2, width + 1), dtype=bool)
+    # flatten_array is indexed by column first, so transpose it to get
+    # the cells row by row.
+    mask[1:-1, :-1] = grid.T == target
+    return mask.ravel()
@@ -15,11 +15,15 @@ At the bottom of the file, there are some function that you
 can call to try playing the game in several different configurations.
 """
 import random
-from typing import List
+from typing import List, Optional
 from app.block import Block, random_init
 from app.goal import BlobGoal, PerimeterGoal
-from app.player import Player, HumanPlayer, RandomPlayer, SmartPlayer
-from app.renderer import Renderer, COLOUR_LIST, colour_name, BOARD_WIDTH
+from app.player import Player, HumanPlayer, RandomPlayer, SmartPlayer, \
+    SearchPlayer, MCTSPlayer
+from app.renderer import BaseRenderer, Renderer, NullRenderer, COLOUR_LIST, \
+    colour_name, BOARD_WIDTH
+from app.metrics import Metrics
+from app.score_table import ScoreTable
 import math  # Agregar esta línea para evitar el NameError en random_init
 
 
@@ -34,21 +38,44 @@ class Game:
         and tracking user interactions with the Blocky board.
     players:
         The entities that are playing this game.
+    moves_made:
+        The number of moves made in the last call to run_game, not counting
+        the turns in which a player passed.
 
     === Representation Invariants ===
     - len(players) >= 1
     """
     board: Block
-    renderer: Renderer
+    renderer: BaseRenderer
     players: List[Player]
+    moves_made: int
 
     def __init__(self, max_depth: int,
                  num_human: int,
                  random_players: int,
-                 smart_players: List[int]) -> None:
-        """Initialize a new game."""
+                 smart_players: List[int],
+                 renderer: Optional[BaseRenderer] = None,
+                 search_players: Optional[List[float]] = None,
+                 mcts_players: Optional[List[float]] = None) -> None:
+        """Initialize a new game.
+
+        If <renderer> is None, show the game in a new pygame window.  Pass a
+        NullRenderer to play a game of computer players headless.
+
+        <search_players> holds the time limit, in seconds, of each
+        SearchPlayer, who play after the smart players.  <mcts_players> holds
+        the time limit of each MCTSPlayer, who play last.
+        """
+        if search_players is None:
+            search_players = []
+        if mcts_players is None:
+            mcts_players = []
+
         # Create a Renderer for this game
-        self.renderer = Renderer(len(smart_players) + num_human + random_players)
+        if renderer is None:
+            renderer = Renderer(len(smart_players) + num_human + random_players
+                                + len(search_players) + len(mcts_players))
+        self.renderer = renderer
 
         # Generate a random goal type (BlobGoal or PerimeterGoal)
         goal_class = random.choice([BlobGoal, PerimeterGoal])
@@ -57,9 +84,11 @@ class Game:
 
         # Generate a random board with the given max depth
         self.board = random_init(0, max_depth)
+        self.board.update_block_locations((0, 0), BOARD_WIDTH)
 
         # Generate players
         self.players = []
+        self.moves_made = 0
         player_id = 0
 
         # Create human players
@@ -77,15 +106,33 @@ class Game:
             self.players.append(SmartPlayer(self.renderer, player_id, goal, difficulty))
             player_id += 1
 
+        # Create search players with their respective time limits
+        for time_limit in search_players:
+            self.players.append(SearchPlayer(self.renderer, player_id, goal,
+                                             time_limit))
+            player_id += 1
+
+        # Create MCTS players with their respective time limits
+        for time_limit in mcts_players:
+            self.players.append(MCTSPlayer(self.renderer, player_id, goal,
+                                           time_limit))
+            player_id += 1
+
         # Assign a random colour to each player and display their goal
         for player in self.players:
             player.goal = goal_class(random.choice(COLOUR_LIST))
             self.renderer.display_goal(player)
 
+        # Tell each player its opponents' goals, in the order they move
+        for i, player in enumerate(self.players):
+            others = self.players[i + 1:] + self.players[:i]
+            player.opponent_goals = [other.goal for other in others]
+
         # Draw the initial board
         self.renderer.draw(self.board, 0)
 
-    def run_game(self, num_turns: int) -> None:
+    def run_game(self, num_turns: int, verbose: bool = True,
+                 metrics: Optional[Metrics] = None) -> List[int]:
         """Run the game for the number of turns specified.
 
         Each player gets <num_turns> turns. The first player in self.players
@@ -98,24 +145,75 @@ class Game:
 
         When the game is over, print who won to the console.
 
+        If <verbose> is False, print nothing.  Return the final score of each
+        player, in the order of self.players.
+
+        The score printed after each move is that of the mover's goal alone.
+        The final scores are read from a ScoreTable, so the board is scanned
+        once for all of the players rather than once per player.
+
+        If <metrics> is not None, record every turn in it, and print its
+        summary at the end if <verbose> is True.
+
+        When the game is over, close every player, as close does.
+        """
+        try:
+            if metrics is None:
+                return self._run_turns(num_turns, verbose, None)
+            metrics.attach(self)
+            try:
+                return self._run_turns(num_turns, verbose, metrics)
+            finally:
+                metrics.detach(self)
+                if verbose:
+                    print(metrics.summary())
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        """Release the resources, such as worker processes, held by the
+        players of this game.
+        """
+        for player in self.players:
+            player.close()
+
+    def _run_turns(self, num_turns: int, verbose: bool,
+                   metrics: Optional[Metrics]) -> List[int]:
+        """Play the game as described in run_game, recording each turn in
+        <metrics> if it is not None.
         """
         # Index within self.players of the current player.
         index = 0
+        self.moves_made = 0
         for turn in range(num_turns * len(self.players)):
             player = self.players[index]
-            print(f'Player {player.id}, turn {turn}')
-            if self.players[index].make_move(self.board) == 1:
-                break
-            else:
+            if verbose:
+                print(f'Player {player.id}, turn {turn}')
+            if metrics is not None:
+                metrics.start_turn(turn, player.id)
+            move = self.players[index].make_move(self.board)
+            if move != 1 and verbose:
+                # El cálculo del puntaje cuenta dentro del turno.
                 print(f'Player {player.id} CURRENT SCORE: ' +
                       f'{player.goal.score(self.board)}')
-                index = (index + 1) % len(self.players)
+            if metrics is not None:
+                metrics.end_turn()
+            if move == 1:
+                break
+            if move == 0:
+                self.moves_made += 1
+            index = (index + 1) % len(self.players)
 
         # Determine and report the winner.
+        table = ScoreTable(self.board)
+        scores = [player.goal.score_from(table) for player in self.players]
+        if not verbose:
+            return scores
+
         max_score = 0
         winning_player = 0
         for i in range(len(self.players)):
-            score = self.players[i].goal.score(self.board)
+            score = scores[i]
             print(f'Player {i} : {score}')
             if score > max_score:
                 max_score = score
@@ -126,6 +224,7 @@ class Game:
             print(f'Player {player.id} ' +
                   f'goal = \n\t{player.goal.description()}: ' +
                   f'{colour_name(player.goal.colour)}')
+        return scores
 
 
 def auto_game() -> None:
@@ -136,6 +235,15 @@ def auto_game() -> None:
     game.run_game(10)
 
 
+def headless_game() -> None:
+    """Run a game with two computer players without opening a window or
+    pausing between moves.
+    """
+    random.seed(1001)
+    game = Game(4, 0, 0, [1, 6], NullRenderer())
+    game.run_game(10)
+
+
 def two_player_game() -> None:
     """Run a game with two human players.
     """
@@ -175,11 +283,20 @@ if __name__ == '__main__':
     # two_player_game()
     # solitaire_game()
 
+def split_probability(level: int) -> float:
+    """Return the probability that random_init subdivides a Block at <level>
+    that is above the maximum depth.
+    """
+    return math.exp(-0.25 * level)
+
+
 def random_init(level: int, max_depth: int) -> Block:
     """Return a randomly-generated Block with level <level> and subdivided
     to a maximum depth of <max_depth>."""
-    if level == max_depth or random.random() >= math.exp(-0.25 * level):
-        return Block(level, random.choice(COLOUR_LIST))
+    if level == max_depth or random.random() >= split_probability(level):
+        block = Block(level, random.choice(COLOUR_LIST))
     else:
         children = [random_init(level + 1, max_depth) for _ in range(4)]
-        return Block(level, children=children)
+        block = Block(level, children=children)
+    block.max_depth = max_depth
+    return block
@@ -11,9 +11,20 @@ University of Toronto
 This file contains the Goal class hierarchy.
 """
 
-from typing import List, Tuple
+from typing import List, Optional, Tuple
+import numpy as np
 from app.block import Block
-
+from app.blob_index import BlobIndex
+from app.flood_fill import largest_blob
+from app.renderer import colour_index
+from app.score_table import ScoreTable
+
+# The sides of the board that a Block touches, as bits: top, bottom, left and
+# right.  _QUADRANT_SIDES[i] holds the sides of a Block that child i of that
+# Block can touch.
+_TOP, _BOTTOM, _LEFT, _RIGHT = 1, 2, 4, 8
+_QUADRANT_SIDES = [_TOP | _RIGHT, _TOP | _LEFT, _BOTTOM | _LEFT,
+                   _BOTTOM | _RIGHT]
 
 class Goal:
     """A player goal in the game of Blocky.
@@ -39,6 +50,24 @@ class Goal:
         """
         raise NotImplementedError
 
+    def score_array(self, grid: np.ndarray) -> int:
+        """Return the score for this goal on the board whose colour indices
+        are <grid>, as returned by Block.flatten_array.
+
+        The score is always greater than or equal to 0
+        """
+        raise NotImplementedError
+
+    def score_from(self, table: ScoreTable) -> int:
+        """Return the score for this goal on the board scored by <table>.
+        """
+        raise NotImplementedError
+
+    def max_score(self, board: Block) -> int:
+        """Return the highest score this goal can reach on <board>.
+        """
+        raise NotImplementedError
+
     def description(self) -> str:
         """Return a description of this goal.
         """
@@ -48,21 +77,48 @@ class Goal:
 class BlobGoal(Goal):
     """A goal to create the largest connected blob of this goal's target
     colour, anywhere within the Block.
+
+    The blobs of the most recently scored board are kept in a BlobIndex, so
+    scoring the same board again after a move only re-examines the region
+    that the move changed.
     """
+    # === Private Attributes ===
+    # _index:
+    #     The blobs of the target colour on the board most recently scored,
+    #     or None if no board has been scored yet.
+    _index: Optional[BlobIndex]
+
+    def __init__(self, target_colour: Tuple[int, int, int]) -> None:
+        """Initialize this goal to have the given target colour.
+        """
+        super().__init__(target_colour)
+        self._index = None
 
     def score(self, board: Block) -> int:
         """Return the score for this goal on the given board."""
-        flattened = board.flatten()
-        visited = [[-1 for _ in range(len(flattened))] for _ in range(len(flattened))]
-        max_blob_size = 0
+        if self._index is None or self._index.board is not board \
+                or self._index.colour != self.colour:
+            if self._index is not None:
+                self._index.detach()
+            self._index = BlobIndex(board, self.colour)
+        return self._index.largest()
+
+    def score_array(self, grid: np.ndarray) -> int:
+        """Return the score for this goal on the board whose colour indices
+        are <grid>, as returned by Block.flatten_array.
+        """
+        return largest_blob(grid, colour_index(self.colour))
 
-        for i in range(len(flattened)):
-            for j in range(len(flattened)):
-                if visited[i][j] == -1:  # Not visited
-                    blob_size = self._undiscovered_blob_size((i, j), flattened, visited)
-                    max_blob_size = max(max_blob_size, blob_size)
+    def score_from(self, table: ScoreTable) -> int:
+        """Return the score for this goal on the board scored by <table>.
+        """
+        return table.blob(self.colour)
 
-        return max_blob_size
+    def max_score(self, board: Block) -> int:
+        """Return the highest score this goal can reach on <board>: every
+        unit cell in one blob.
+        """
+        return 4 ** (board.max_depth - board.level)
 
     def description(self) -> str:
         """Return a description of this goal."""
@@ -87,9 +143,13 @@ class BlobGoal(Goal):
 
         Update <visited> so that all cells that are visited are marked with
         either 0 or 1.
+
+        The blob is explored with an explicit stack, so its size is not
+        limited by the recursion limit.
         """
         x, y = pos
-        if not (0 <= x < len(board) and 0 <= y < len(board)):
+        width = len(board)
+        if not (0 <= x < width and 0 <= y < width):
             return 0
         if visited[x][y] != -1:
             return 0
@@ -98,10 +158,20 @@ class BlobGoal(Goal):
             return 0
 
         visited[x][y] = 1
-        size = 1  # Count this cell
-        # Check neighbors (up, down, left, right)
-        for dx, dy in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
-            size += self._undiscovered_blob_size((x + dx, y + dy), board, visited)
+        size = 0
+        stack = [pos]
+        while stack:
+            x, y = stack.pop()
+            size += 1  # Count this cell
+            # Check neighbors (up, down, left, right)
+            for nx, ny in ((x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1)):
+                if 0 <= nx < width and 0 <= ny < width \
+                        and visited[nx][ny] == -1:
+                    if board[nx][ny] == self.colour:
+                        visited[nx][ny] = 1
+                        stack.append((nx, ny))
+                    else:
+                        visited[nx][ny] = 0
 
         return size
 
@@ -109,32 +179,76 @@ class BlobGoal(Goal):
 class PerimeterGoal(Goal):
     """A goal to maximize the number of unit cells of the target colour
     on the outer perimeter of the board.
+
+    A board scored for the first time is walked along its perimeter only,
+    which needs nothing from the Blocks inside it.  Scoring the same board
+    again reads the colour aggregates that the board keeps, which after a
+    move are only recomputed for the Blocks that the move changed.
     """
+    # === Private Attributes ===
+    # _board:
+    #     The board most recently scored, or None if no board has been
+    #     scored yet.
+    _board: Optional[Block]
+
+    def __init__(self, target_colour: Tuple[int, int, int]) -> None:
+        """Initialize this goal to have the given target colour.
+        """
+        super().__init__(target_colour)
+        self._board = None
 
     def score(self, board: Block) -> int:
         """
         Calculate the score for this goal based on the number of unit cells
         of the target colour that are on the perimeter of the board.
+        Corner cells count once for each side.
+        """
+        if board is self._board:
+            return board.border_count(self.colour)
+        self._board = board
+        return self.score_walk(board)
+
+    def score_walk(self, board: Block) -> int:
+        """Return the score for this goal on <board>, visiting only the
+        Blocks that touch the perimeter.
+
+        An undivided Block at level l covers 2^(max_depth - l) unit cells of
+        each side it touches; corner cells count once for each side.
+        """
+        score = 0
+        stack = [(board, _TOP | _BOTTOM | _LEFT | _RIGHT)]
+        while stack:
+            block, sides = stack.pop()
+            if block.children:
+                for child, quadrant in zip(block.children, _QUADRANT_SIDES):
+                    if sides & quadrant:
+                        stack.append((child, sides & quadrant))
+            elif block.colour == self.colour:
+                score += bin(sides).count('1') \
+                    * 2 ** (board.max_depth - block.level)
+        return score
+
+    def score_array(self, grid: np.ndarray) -> int:
+        """Return the number of unit cells of the target colour on the
+        perimeter of the board whose colour indices are <grid>, as returned
+        by Block.flatten_array.  Corner cells count once for each side.
+        """
+        target = colour_index(self.colour)
+        return int(np.count_nonzero(grid[0] == target)
+                   + np.count_nonzero(grid[-1] == target)
+                   + np.count_nonzero(grid[:, 0] == target)
+                   + np.count_nonzero(grid[:, -1] == target))
+
+    def score_from(self, table: ScoreTable) -> int:
+        """Return the score for this goal on the board scored by <table>.
+        """
+        return table.perimeter(self.colour)
+
+    def max_score(self, board: Block) -> int:
+        """Return the highest score this goal can reach on <board>: every
+        cell of the perimeter, with corners counted twice.
         """
-        flattened = board.flatten()
-        size = len(flattened)
-        count = 0
-
-        # Revisar los bordes superior e inferior
-        for i in range(size):
-            if flattened[0][i] == self.colour:  # Borde superior
-                count += 1
-            if flattened[size - 1][i] == self.colour:  # Borde inferior
-                count += 1
-
-        # Revisar los bordes izquierdo y derecho
-        for i in range(size):
-            if flattened[i][0] == self.colour:  # Borde izquierdo
-                count += 1
-            if flattened[i][size - 1] == self.colour:  # Borde derecho
-                count += 1
-
-        return count
+        return 4 * 2 ** (board.max_depth - board.level)
 
     def description(self) -> str:
         """Return a description of this goal."""
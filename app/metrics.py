@@ -0,0 +1,173 @@
+"""Assignment 2 - Blocky
+
+=== CSC148 Fall 2017 ===
+Diane Horton and David Liu
+Department of Computer Science,
+University of Toronto
+
+
+=== Module Description ===
+
+This file contains the Metrics class, which records where the time of a game
+goes, turn by turn: choosing moves, scoring goals, drawing and waiting.
+
+A Metrics collector is passed to Game.run_game.  It times calls by replacing
+the methods of the game's own players, goals and renderer with timed
+wrappers for the length of the game, so a game played without one runs the
+original methods untouched.
+"""
+import json
+import time
+from typing import Any, Dict, IO, List, Optional, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from app.game import Game
+
+# The methods that Metrics times, as (label, attribute of the game that holds
+# the objects, method name).
+TIMED_METHODS = [('Player.make_move', 'players', 'make_move'),
+                 ('Goal.score', 'goals', 'score'),
+                 ('Renderer.draw', 'renderer', 'draw'),
+                 ('Renderer.wait', 'renderer', 'wait')]
+
+
+class Metrics:
+    """Per-turn timings and counts for a game.
+
+    Each turn is recorded as a dict with these keys:
+        'turn': the turn number, counting from 0,
+        'player': the id of the player who moved,
+        'seconds': the wall time of the turn,
+        'calls': the number of calls of each timed method,
+        'times': the total seconds spent in each timed method; a method
+                 called by another counts towards both, and
+        'counts': totals reported with count, such as 'nodes' (board
+                  positions evaluated) and 'candidates' (candidate moves
+                  considered).
+
+    === Public Attributes ===
+    turns:
+        The record of each turn so far, in order.
+    """
+    # === Private Attributes ===
+    # _current:
+    #     The record of the turn in progress, or None between turns.
+    # _started:
+    #     The time at which the turn in progress started.
+    # _wrapped:
+    #     The objects and names of the methods replaced by attach.
+    turns: List[Dict[str, Any]]
+    _current: Optional[Dict[str, Any]]
+    _started: float
+    _wrapped: List[Tuple[object, str]]
+
+    def __init__(self) -> None:
+        """Initialize a collector with no turns recorded."""
+        self.turns = []
+        self._current = None
+        self._started = 0.0
+        self._wrapped = []
+
+    def attach(self, game: 'Game') -> None:
+        """Start timing the players, goals and renderer of <game>, and let
+        its players report counts.
+        """
+        objects = {'players': game.players,
+                   'goals': [player.goal for player in game.players],
+                   'renderer': [game.renderer]}
+        for label, attribute, name in TIMED_METHODS:
+            seen = set()
+            for obj in objects[attribute]:
+                if id(obj) not in seen:
+                    seen.add(id(obj))
+                    self._wrap(obj, name, label)
+        for player in game.players:
+            player.metrics = self
+
+    def detach(self, game: 'Game') -> None:
+        """Restore the methods replaced by attach and stop collecting
+        counts from the players of <game>.
+        """
+        for obj, name in self._wrapped:
+            delattr(obj, name)
+        self._wrapped = []
+        for player in game.players:
+            player.metrics = None
+
+    def start_turn(self, turn: int, player_id: int) -> None:
+        """Start recording turn number <turn>, played by <player_id>."""
+        self._current = {'turn': turn, 'player': player_id, 'seconds': 0.0,
+                         'calls': {}, 'times': {}, 'counts': {}}
+        self._started = time.perf_counter()
+
+    def end_turn(self) -> None:
+        """Finish recording the turn in progress."""
+        if self._current is not None:
+            self._current['seconds'] = time.perf_counter() - self._started
+            self.turns.append(self._current)
+            self._current = None
+
+    def count(self, name: str, amount: int = 1) -> None:
+        """Add <amount> to the count called <name> for the turn in progress.
+        """
+        if self._current is not None:
+            counts = self._current['counts']
+            counts[name] = counts.get(name, 0) + amount
+
+    def totals(self) -> Dict[str, Any]:
+        """Return the calls, times and counts of every turn added up, along
+        with the number of turns and their total wall time.
+        """
+        totals = {'turns': len(self.turns), 'seconds': 0.0,
+                  'calls': {}, 'times': {}, 'counts': {}}
+        for turn in self.turns:
+            totals['seconds'] += turn['seconds']
+            for key in ('calls', 'times', 'counts'):
+                for name, value in turn[key].items():
+                    totals[key][name] = totals[key].get(name, 0) + value
+        return totals
+
+    def write_json_lines(self, file: IO[str]) -> None:
+        """Write the record of each turn to <file> as one line of JSON."""
+        for turn in self.turns:
+            file.write(json.dumps(turn) + '\n')
+
+    def summary(self) -> str:
+        """Return a table of the calls and time of each timed method, and
+        the counts, over all turns.
+        """
+        totals = self.totals()
+        lines = [f'{totals["turns"]} turns in {totals["seconds"]:.3f}s',
+                 f'{"method":20} {"calls":>8} {"total s":>10} {"ms/call":>9}']
+        for label, _, _ in TIMED_METHODS:
+            calls = totals['calls'].get(label, 0)
+            seconds = totals['times'].get(label, 0.0)
+            per_call = seconds / calls * 1000 if calls else 0.0
+            lines.append(f'{label:20} {calls:8} {seconds:10.3f} '
+                         f'{per_call:9.3f}')
+        for name, value in sorted(totals['counts'].items()):
+            lines.append(f'{name:20} {value:8}')
+        return '\n'.join(lines)
+
+    def _wrap(self, obj: object, name: str, label: str) -> None:
+        """Replace method <name> of <obj> with one that records its calls
+        under <label>.
+        """
+        method = getattr(obj, name)
+
+        def timed(*args: Any, **kwargs: Any) -> Any:
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self._record(label, time.perf_counter() - start)
+
+        setattr(obj, name, timed)
+        self._wrapped.append((obj, name))
+
+    def _record(self, label: str, seconds: float) -> None:
+        """Record a call under <label> that took <seconds>."""
+        if self._current is not None:
+            calls, times = self._current['calls'], self._current['times']
+            calls[label] = calls.get(label, 0) + 1
+            times[label] = times.get(label, 0.0) + seconds
@@ -0,0 +1,85 @@
+"""Assignment 2 - Blocky
+
+=== CSC148 Fall 2017 ===
+Diane Horton and David Liu
+Department of Computer Science,
+University of Toronto
+
+
+=== Module Description ===
+
+This file contains functions for scoring a SmartPlayer's candidate moves in
+parallel worker processes.
+
+A Block tree is not sent to the workers as it is, since pickling it drags
+along every parent back-reference.  Each worker instead receives the board
+in the compact form of app.serialization and rebuilds its own copy.
+Candidate moves are sent as the path of child indices from the board to the
+moved Block.
+"""
+from concurrent.futures import Executor
+from typing import List, Tuple, Type
+from app.block import Block, POOL
+from app.goal import Goal
+from app.serialization import serialize, deserialize
+
+# A candidate move as sent to a worker: the path of child indices from the
+# board to the Block to move, and the move to apply to it.
+Candidate = Tuple[List[int], str]
+
+
+def evaluate_candidates(board: Block, goal: Goal,
+                        candidates: List[Tuple[Block, str]],
+                        executor: Executor, num_shards: int) -> int:
+    """Return the index in <candidates> of the candidate move whose result
+    scores highest for <goal> on <board>, or -1 if there are no candidates.
+
+    The candidates are split into <num_shards> contiguous shards, each scored
+    by a task submitted to <executor>.  Ties go to the earliest candidate, as
+    they would if the candidates were scored one after another.
+
+    Each candidate is a Block within <board> and the move to apply to it.
+    """
+    if not candidates:
+        return -1
+    encoded = serialize(board)
+    skip = len(board.path())
+    paths = [(block.path()[skip:], move) for block, move in candidates]
+
+    shard_size = -(-len(paths) // max(num_shards, 1))
+    futures = [executor.submit(_best_in_shard, encoded, type(goal),
+                               goal.colour, paths[start:start + shard_size],
+                               start)
+               for start in range(0, len(paths), shard_size)]
+
+    best_score, best_index = -1, -1
+    for future in futures:
+        score, index = future.result()
+        if score > best_score:
+            best_score, best_index = score, index
+    return best_index
+
+
+def _best_in_shard(encoded: bytes, goal_class: Type[Goal],
+                   colour: Tuple[int, int, int], shard: List[Candidate],
+                   offset: int) -> Tuple[int, int]:
+    """Return the highest score for the goal of <goal_class> and <colour>
+    reached by a candidate in <shard>, and that candidate's index in the full
+    list of candidates, of which <shard> starts at <offset>.
+
+    <encoded> is the board, as returned by serialize.
+    """
+    board = deserialize(encoded)
+    goal = goal_class(colour)
+    best_score, best_index = -1, -1
+    for i, (path, move) in enumerate(shard):
+        block = board
+        for child in path:
+            block = block.children[child]
+        token = block.apply_move(move)
+        score = goal.score(board)
+        block.undo_move(token)
+        if score > best_score:
+            best_score, best_index = score, offset + i
+    POOL.release(board)
+    return best_score, best_index
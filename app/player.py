@@ -11,12 +11,21 @@ University of Toronto
 This file contains the player class hierarchy.
 """
 
+import math
 import random
-from typing import Optional
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple, TYPE_CHECKING
 import pygame
-from app.renderer import Renderer
-from app.block import Block
+from app.renderer import BaseRenderer
+from app.block import Block, ROTATE_CLOCKWISE, ROTATE_COUNTERCLOCKWISE, \
+    SWAP_HORIZONTAL, SWAP_VERTICAL, SMASH
 from app.goal import Goal
+from app.parallel import evaluate_candidates
+from app.transposition import TranspositionTable
+
+if TYPE_CHECKING:
+    from app.metrics import Metrics
 
 TIME_DELAY = 600
 
@@ -35,26 +44,44 @@ class Player:
         for example as "Player 2"
     goal:
         This player's assigned goal for the game.
+    metrics:
+        The Metrics collector that this player reports counts to, or None.
+    opponent_goals:
+        The goals of the other players in the game, in the order in which
+        they move after this player.  Game sets them once every player has
+        a goal.
     """
-    renderer: Renderer
+    renderer: BaseRenderer
     id: int
     goal: Goal
+    metrics: Optional['Metrics']
+    opponent_goals: List[Goal]
 
-    def __init__(self, renderer: Renderer, player_id: int, goal: Goal) -> None:
+    def __init__(self, renderer: BaseRenderer, player_id: int,
+                 goal: Goal) -> None:
         """Initialize this Player.
         """
         self.goal = goal
         self.renderer = renderer
         self.id = player_id
+        self.metrics = None
+        self.opponent_goals = []
 
     def make_move(self, board: Block) -> int:
         """Choose a move to make on the given board, and apply it, mutating
         the Board as appropriate.
 
-        Return 0 upon successful completion of a move, and 1 upon a QUIT event.
+        Return 0 upon successful completion of a move, 2 if there was no move
+        to make and this player passed, and 1 upon a QUIT event.
         """
         raise NotImplementedError
 
+    def close(self) -> None:
+        """Release any resources, such as worker processes, held by this
+        Player.
+        """
+        pass
+
 
 class HumanPlayer(Player):
     """A human player.
@@ -85,7 +112,8 @@ class HumanPlayer(Player):
     _selected_block: Optional[Block]
     _level: int
 
-    def __init__(self, renderer: Renderer, player_id: int, goal: Goal) -> None:
+    def __init__(self, renderer: BaseRenderer, player_id: int,
+                 goal: Goal) -> None:
         """Initialize this HumanPlayer with the given <renderer>, <player_id>
         and <goal>.
         """
@@ -214,20 +242,13 @@ class RandomPlayer(Player):
         # Highlight the block and draw the board
         block.highlighted = True
         self.renderer.draw(board, self.id)
-        pygame.time.wait(TIME_DELAY)
-
-        # Choose a random action
-        action = random.choice(["rotate_cw", "rotate_ccw", "swap_h", "swap_v", "smash"])
-        if action == "rotate_cw":
-            block.rotate(1)
-        elif action == "rotate_ccw":
-            block.rotate(3)
-        elif action == "swap_h":
-            block.swap(0)
-        elif action == "swap_v":
-            block.swap(1)
-        elif action == "smash" and block.smash():
-            pass  # Smash is applied only if valid
+        self.renderer.wait(TIME_DELAY)
+
+        # Choose a random action.  A smash is applied only if valid.
+        block.apply_move(random.choice([ROTATE_CLOCKWISE,
+                                        ROTATE_COUNTERCLOCKWISE,
+                                        SWAP_HORIZONTAL, SWAP_VERTICAL,
+                                        SMASH]))
 
         # Remove highlight and redraw the board
         block.highlighted = False
@@ -236,12 +257,35 @@ class RandomPlayer(Player):
 
 
 class SmartPlayer(Player):
-    """A smart player that evaluates moves and chooses the best one."""
+    """A smart player that evaluates moves and chooses the best one.
 
-    def __init__(self, renderer: Renderer, player_id: int, goal: Goal, difficulty: int) -> None:
+    === Public Attributes ===
+    difficulty:
+        How many candidate moves this player evaluates, from 5 at
+        difficulty 0 to 150 at difficulty 5 and above.
+    workers:
+        The number of worker processes over which candidate moves are
+        scored.  If it is 0 or 1, they are scored in this process.
+    """
+    # === Private Attributes ===
+    # _executor:
+    #     The pool of worker processes, created on the first move that uses
+    #     it, or None.
+    # _table:
+    #     The scores of boards this player has already evaluated.
+    difficulty: int
+    workers: int
+    _executor: Optional[ProcessPoolExecutor]
+    _table: TranspositionTable
+
+    def __init__(self, renderer: BaseRenderer, player_id: int, goal: Goal,
+                 difficulty: int, workers: int = 0) -> None:
         """Initialize this SmartPlayer with the given difficulty level."""
         super().__init__(renderer, player_id, goal)
         self.difficulty = difficulty
+        self.workers = workers
+        self._executor = None
+        self._table = TranspositionTable()
 
     def make_move(self, board: Block) -> int:
         """Evaluate possible moves and choose the best one."""
@@ -249,65 +293,555 @@ class SmartPlayer(Player):
 
         # Determine the number of moves to evaluate based on difficulty
         moves_to_evaluate = min(150, [5, 10, 25, 50, 100, 150][min(self.difficulty, 5)])
-        best_score = -1
-        best_move = None
-        best_block = None
-
-        for _ in range(moves_to_evaluate):
-            # Choose a random block
-            block = board.get_selected_block(
-                (random.randint(0, board.size), random.randint(0, board.size)),
-                random.randint(0, board.max_depth)
-            )
-
-            # Choose a random action (excluding smash)
-            action = random.choice(["rotate_cw", "rotate_ccw", "swap_h", "swap_v"])
-            original_state = board.flatten()
-
-            # Apply the action
-            if action == "rotate_cw":
-                block.rotate(1)
-            elif action == "rotate_ccw":
-                block.rotate(3)
-            elif action == "swap_h":
-                block.swap(0)
-            elif action == "swap_v":
-                block.swap(1)
 
-            # Evaluate the score
-            score = self.goal.score(board)
+        # Sample distinct moves (excluding smash), skipping those that
+        # cannot change the board
+        moves = list(board.moves())
+        candidates = random.sample(moves, min(moves_to_evaluate, len(moves)))
+
+        if self.workers > 1:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(self.workers)
+            best = evaluate_candidates(board, self.goal, candidates,
+                                       self._executor, self.workers)
+            nodes = len(candidates)
+        else:
+            misses = self._table.misses
+            best = self._best_candidate(board, candidates)
+            # Boards found in the table were not evaluated again.
+            nodes = self._table.misses - misses
+        if self.metrics is not None:
+            self.metrics.count('candidates', len(candidates))
+            self.metrics.count('nodes', nodes)
 
-            # Undo the action
-            board.update_block_locations((0, 0), board.size)
-            for i, row in enumerate(original_state):
-                for j, colour in enumerate(row):
-                    board.flatten()[i][j] = colour
+        # Apply the best move
+        if best >= 0:
+            best_block, best_move = candidates[best]
+            best_block.highlighted = True
+            self.renderer.draw(board, self.id)
+            self.renderer.wait(TIME_DELAY)
+
+            best_block.apply_move(best_move)
+
+            best_block.highlighted = False
+            self.renderer.draw(board, self.id)
+            return 0
+
+        return 2
+
+    def close(self) -> None:
+        """Shut down the pool of worker processes, if there is one.
+
+        A later move that needs the pool starts a new one.
+        """
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def _best_candidate(self, board: Block,
+                        candidates: List[Tuple[Block, str]]) -> int:
+        """Return the index in <candidates> of the move whose result scores
+        highest for this player's goal, or -1 if there are no candidates.
+        Ties go to the earliest candidate.
+        """
+        best_score = -1
+        best = -1
+        for i, (block, action) in enumerate(candidates):
+            # Apply the action, evaluate the score and undo the action
+            token = block.apply_move(action)
+            score = self._table.score(self.goal, board)
+            block.undo_move(token)
 
             # Keep track of the best move
             if score > best_score:
                 best_score = score
-                best_move = action
-                best_block = block
+                best = i
+        return best
 
-        # Apply the best move
-        if best_block:
-            best_block.highlighted = True
+
+
+class _OutOfTime(Exception):
+    """Raised inside SearchPlayer's search when its deadline has passed."""
+
+
+class SearchPlayer(Player):
+    """A player that looks ahead over its own moves and its opponents'
+    replies, and chooses the move that leads to the best position.
+
+    Positions are scored as this player's goal score minus the best score
+    among its opponents' goals.  The search assumes that every opponent
+    replies with the move that is worst for this player, and prunes with
+    alpha-beta.  It deepens one ply at a time until <time_limit> runs out,
+    and then makes the best move of the deepest search it completed.
+
+    Only rotations and swaps are searched: a smash is random, so its result
+    cannot be looked ahead at.
+
+    === Public Attributes ===
+    time_limit:
+        The number of seconds this player may spend choosing a move.
+    max_plies:
+        The deepest search, in moves, this player will make.
+    depth_reached:
+        The number of plies of the last search completed before the deadline
+        in the most recent move, or 0 if none was.
+
+    === Representation Invariants ===
+    - time_limit > 0
+    - max_plies >= 1
+    """
+    # === Private Attributes ===
+    # _table:
+    #     The goal scores of positions this player has already evaluated.
+    # _deadline:
+    #     The time, by time.perf_counter, at which the move in progress
+    #     must be chosen.
+    # _nodes:
+    #     The number of positions visited in the move in progress.
+    time_limit: float
+    max_plies: int
+    depth_reached: int
+    _table: TranspositionTable
+    _deadline: float
+    _nodes: int
+
+    def __init__(self, renderer: BaseRenderer, player_id: int, goal: Goal,
+                 time_limit: float = 1.0, max_plies: int = 6) -> None:
+        """Initialize this SearchPlayer with the given time limit, in
+        seconds, and the given deepest search.
+        """
+        super().__init__(renderer, player_id, goal)
+        self.time_limit = time_limit
+        self.max_plies = max_plies
+        self.depth_reached = 0
+        self._table = TranspositionTable()
+        self._deadline = 0.0
+        self._nodes = 0
+
+    def make_move(self, board: Block) -> int:
+        """Search for the best move within the time limit and apply it."""
+        move = self.choose_move(board)
+        if move is not None:
+            block, action = move
+            block.highlighted = True
             self.renderer.draw(board, self.id)
-            pygame.time.wait(TIME_DELAY)
+            self.renderer.wait(TIME_DELAY)
 
-            if best_move == "rotate_cw":
-                best_block.rotate(1)
-            elif best_move == "rotate_ccw":
-                best_block.rotate(3)
-            elif best_move == "swap_h":
-                best_block.swap(0)
-            elif best_move == "swap_v":
-                best_block.swap(1)
+            block.apply_move(action)
 
-            best_block.highlighted = False
+            block.highlighted = False
             self.renderer.draw(board, self.id)
+            return 0
+        return 2
 
-        return 0
+    def choose_move(self, board: Block) -> Optional[Tuple[Block, str]]:
+        """Return the best move on <board> found within the time limit, as a
+        Block and the move to apply to it, or None if there is no move.
+
+        <board> is left as it was.
+        """
+        self._deadline = time.perf_counter() + self.time_limit
+        self._nodes = 0
+        self.depth_reached = 0
+
+        moves = list(board.moves())
+        if not moves:
+            return None
+        best = moves[0]
+        values: List[float] = []
+        try:
+            # La búsqueda de profundidad 1 da el orden inicial por valor
+            # inmediato, bajo el mismo control de tiempo que las demás.
+            for depth in range(1, self.max_plies + 1):
+                values = []
+                self._search_root(board, moves, depth, values)
+                # Search the best moves of this depth first at the next one.
+                order = sorted(range(len(moves)), key=lambda i: -values[i])
+                moves = [moves[i] for i in order]
+                best = moves[0]
+                self.depth_reached = depth
+        except _OutOfTime:
+            if self.depth_reached == 0 and values:
+                # A depth 1 value is exact, so the best of those computed
+                # beats an arbitrary move.
+                best = moves[max(range(len(values)), key=values.__getitem__)]
+
+        if self.metrics is not None:
+            self.metrics.count('candidates', len(moves))
+            self.metrics.count('nodes', self._nodes)
+        return best
+
+    def _search_root(self, board: Block, moves: List[Tuple[Block, str]],
+                     depth: int, values: List[float]) -> None:
+        """Append to <values> the value of each move in <moves> on <board>,
+        in order, searching <depth> plies in all.
+
+        Each value is exact for the best move, and an upper bound for the
+        others.  If the deadline passes, <values> holds those of the moves
+        searched so far.
+        """
+        alpha = float('-inf')
+        for block, action in moves:
+            token = block.apply_move(action)
+            try:
+                value = self._search(board, depth - 1, 1, alpha,
+                                     float('inf'))
+            finally:
+                block.undo_move(token)
+            values.append(value)
+            alpha = max(alpha, value)
+
+    def _search(self, board: Block, depth: int, ply: int, alpha: float,
+                beta: float) -> float:
+        """Return the value of <board> with <depth> plies left to search,
+        <ply> plies below the move being chosen, knowing that a value of at
+        most <alpha> or at least <beta> will not change the choice.
+
+        Raise _OutOfTime if the deadline has passed.
+        """
+        self._nodes += 1
+        if time.perf_counter() > self._deadline:
+            raise _OutOfTime
+        if depth == 0:
+            return self._evaluate(board)
+
+        maximizing = ply % (len(self.opponent_goals) + 1) == 0
+        moves = list(board.moves())
+        if not moves:
+            return self._evaluate(board)
+        if depth > 1:
+            moves = self._ordered(board, moves, maximizing)
+
+        best = float('-inf') if maximizing else float('inf')
+        for block, action in moves:
+            token = block.apply_move(action)
+            try:
+                value = self._search(board, depth - 1, ply + 1, alpha, beta)
+            finally:
+                block.undo_move(token)
+            if maximizing:
+                best = max(best, value)
+                alpha = max(alpha, best)
+            else:
+                best = min(best, value)
+                beta = min(beta, best)
+            if alpha >= beta:
+                break
+        return best
+
+    def _ordered(self, board: Block, moves: List[Tuple[Block, str]],
+                 maximizing: bool) -> List[Tuple[Block, str]]:
+        """Return <moves> on <board> sorted by the value of the position
+        each leads to, best first for the player who makes them.
+
+        Raise _OutOfTime if the deadline has passed.
+        """
+        values = []
+        for block, action in moves:
+            if time.perf_counter() > self._deadline:
+                raise _OutOfTime
+            token = block.apply_move(action)
+            values.append(self._evaluate(board))
+            block.undo_move(token)
+        order = sorted(range(len(moves)), key=lambda i: values[i],
+                       reverse=maximizing)
+        return [moves[i] for i in order]
+
+    def _evaluate(self, board: Block) -> float:
+        """Return this player's score on <board> minus the best score of its
+        opponents.
+        """
+        value = self._table.score(self.goal, board)
+        if self.opponent_goals:
+            value -= max(self._table.score(goal, board)
+                         for goal in self.opponent_goals)
+        return value
+
+
+
+class _TreeNode:
+    """A position in the search tree of an MCTSPlayer.
+
+    Positions are identified by the structural hash of the board and the
+    player to move, so a position reached by different sequences of moves,
+    or again on a later turn, shares one node.
+
+    === Public Attributes ===
+    mover:
+        The index of the player to move: 0 for the MCTSPlayer and i for
+        opponent_goals[i - 1].
+    moves:
+        The moves from this position, as the path from the board to the
+        Block to move and the move to apply to it, or None if they have not
+        been listed yet.
+    tried:
+        The number of moves, from the front of <moves>, that have been
+        tried at least once.
+    visits:
+        The number of times this position has been searched through.
+    move_visits, move_values:
+        The number of times each move has been searched, and the total of
+        the rewards of the mover over those searches.
+    children:
+        The key of the node each move leads to, or None if it has not been
+        tried or is a smash, whose result is random.
+    """
+    __slots__ = ('mover', 'moves', 'tried', 'visits', 'move_visits',
+                 'move_values', 'children')
+    mover: int
+    moves: Optional[List[Tuple[Tuple[int, ...], str]]]
+    tried: int
+    visits: int
+    move_visits: List[int]
+    move_values: List[float]
+    children: List[Optional[Tuple[int, int]]]
+
+    def __init__(self, mover: int) -> None:
+        """Initialize an unvisited node for a position where <mover> is
+        to move.
+        """
+        self.mover = mover
+        self.moves = None
+        self.tried = 0
+        self.visits = 0
+        self.move_visits = []
+        self.move_values = []
+        self.children = []
+
+
+class MCTSPlayer(Player):
+    """A player that chooses its moves by Monte Carlo tree search.
+
+    Each iteration of the search descends from the current position by the
+    UCT rule, tries one new move, plays <rollout_moves> random moves after
+    it, and credits every player with the result: its goal score, as a
+    fraction of the most it could be, minus the best such fraction among the
+    other players.  Every player is assumed to play for its own reward.
+
+    The search runs until <time_limit> seconds pass or <iterations>
+    iterations are done, and the move searched most often is made.  Nodes
+    are kept between turns, so the positions explored while predicting the
+    opponents' replies are reused if those replies are made.
+
+    === Public Attributes ===
+    time_limit:
+        The number of seconds this player may spend choosing a move.
+    iterations:
+        The most iterations of the search per move, or None for no limit.
+    rollout_moves:
+        The number of random moves played at the end of each iteration.
+    exploration:
+        The UCT exploration constant.
+    max_nodes:
+        The number of nodes above which the tree is pruned to the positions
+        reachable from the current one.
+
+    === Representation Invariants ===
+    - time_limit > 0
+    - rollout_moves >= 0
+    """
+    # === Private Attributes ===
+    # _nodes:
+    #     The search tree, keyed by structural hash and player to move.
+    # _table:
+    #     The goal scores of positions this player has already evaluated.
+    time_limit: float
+    iterations: Optional[int]
+    rollout_moves: int
+    exploration: float
+    max_nodes: int
+    _nodes: Dict[Tuple[int, int], _TreeNode]
+    _table: TranspositionTable
+
+    def __init__(self, renderer: BaseRenderer, player_id: int, goal: Goal,
+                 time_limit: float = 1.0, iterations: Optional[int] = None,
+                 rollout_moves: int = 4, exploration: float = 1.4,
+                 max_nodes: int = 200000) -> None:
+        """Initialize this MCTSPlayer with the given budget and search
+        settings.
+        """
+        super().__init__(renderer, player_id, goal)
+        self.time_limit = time_limit
+        self.iterations = iterations
+        self.rollout_moves = rollout_moves
+        self.exploration = exploration
+        self.max_nodes = max_nodes
+        self._nodes = {}
+        self._table = TranspositionTable()
+
+    def make_move(self, board: Block) -> int:
+        """Search for the best move within the budget and apply it."""
+        move = self.choose_move(board)
+        if move is not None:
+            block, action = move
+            block.highlighted = True
+            self.renderer.draw(board, self.id)
+            self.renderer.wait(TIME_DELAY)
+
+            block.apply_move(action)
+
+            block.highlighted = False
+            self.renderer.draw(board, self.id)
+            return 0
+        return 2
+
+    def choose_move(self, board: Block) -> Optional[Tuple[Block, str]]:
+        """Return the most searched move on <board> once the budget runs
+        out, as a Block and the move to apply to it, or None if there is no
+        move.
+
+        <board> is left as it was.
+        """
+        deadline = time.perf_counter() + self.time_limit
+        root_key = (board.structural_hash(), 0)
+        if len(self._nodes) > self.max_nodes:
+            self._prune(root_key)
+        root = self._node(root_key)
+        self._list_moves(root, board)
+        if not root.moves:
+            return None
+
+        done = 0
+        while time.perf_counter() < deadline and \
+                (self.iterations is None or done < self.iterations):
+            self._iterate(board, root)
+            done += 1
+
+        if self.metrics is not None:
+            self.metrics.count('candidates', root.tried)
+            self.metrics.count('nodes', done)
+        best = max(range(len(root.moves)), key=lambda i: root.move_visits[i])
+        path, action = root.moves[best]
+        return _block_at(board, path), action
+
+    def _iterate(self, board: Block, root: _TreeNode) -> None:
+        """Run one iteration of the search from <root>, the node of <board>,
+        and leave <board> as it was.
+        """
+        num_players = len(self.opponent_goals) + 1
+        tokens = []
+        visited = []
+        try:
+            node = root
+            # Un límite de profundidad evita ciclos de rotaciones.
+            while len(visited) < 4 * num_players:
+                self._list_moves(node, board)
+                if not node.moves:
+                    break
+                if node.tried < len(node.moves):
+                    i = node.tried
+                    node.tried += 1
+                else:
+                    i = self._select(node)
+                path, action = node.moves[i]
+                block = _block_at(board, path)
+                tokens.append((block, block.apply_move(action)))
+                visited.append((node, i))
+
+                key = (board.structural_hash(), len(visited) % num_players)
+                if action != SMASH:
+                    node.children[i] = key
+                expanded = node.move_visits[i] == 0
+                node = self._node(key)
+                if expanded:
+                    break
+
+            for _ in range(self.rollout_moves):
+                block = _random_block(board)
+                tokens.append((block, block.apply_move(random.choice(
+                    [ROTATE_CLOCKWISE, ROTATE_COUNTERCLOCKWISE,
+                     SWAP_HORIZONTAL, SWAP_VERTICAL, SMASH]))))
+            rewards = self._rewards(board)
+        finally:
+            for block, token in reversed(tokens):
+                block.undo_move(token)
+
+        for node, i in visited:
+            node.visits += 1
+            node.move_visits[i] += 1
+            node.move_values[i] += rewards[node.mover]
+
+    def _select(self, node: _TreeNode) -> int:
+        """Return the index of the move of <node> to search next, by UCT.
+
+        Precondition: every move of <node> has been tried.
+        """
+        log_visits = math.log(node.visits + 1)
+        best, best_value = 0, float('-inf')
+        for i in range(len(node.moves)):
+            visits = node.move_visits[i]
+            value = node.move_values[i] / visits + \
+                self.exploration * math.sqrt(log_visits / visits)
+            if value > best_value:
+                best, best_value = i, value
+        return best
+
+    def _rewards(self, board: Block) -> List[float]:
+        """Return the reward of each player on <board>, this player first and
+        then its opponents in the order they move.
+        """
+        fractions = [self._table.score(goal, board) / goal.max_score(board)
+                     for goal in [self.goal] + self.opponent_goals]
+        if len(fractions) == 1:
+            return fractions
+        rewards = []
+        for i in range(len(fractions)):
+            others = fractions[:i] + fractions[i + 1:]
+            rewards.append(fractions[i] - max(others))
+        return rewards
+
+    def _node(self, key: Tuple[int, int]) -> _TreeNode:
+        """Return the node with <key>, creating it if there is none."""
+        node = self._nodes.get(key)
+        if node is None:
+            node = _TreeNode(key[1])
+            self._nodes[key] = node
+        return node
+
+    def _list_moves(self, node: _TreeNode, board: Block) -> None:
+        """List the moves of <node>, the node of <board>, in random order,
+        unless they have been already.
+        """
+        if node.moves is not None:
+            return
+        node.moves = [(tuple(block.path()), action)
+                      for block, action in board.moves(include_smash=True)]
+        random.shuffle(node.moves)
+        node.move_visits = [0] * len(node.moves)
+        node.move_values = [0.0] * len(node.moves)
+        node.children = [None] * len(node.moves)
+
+    def _prune(self, root_key: Tuple[int, int]) -> None:
+        """Keep only the nodes reachable from the node with <root_key>."""
+        kept = {}
+        keys = [root_key]
+        while keys:
+            key = keys.pop()
+            if key in kept or key not in self._nodes:
+                continue
+            kept[key] = self._nodes[key]
+            keys.extend(child for child in kept[key].children
+                        if child is not None)
+        self._nodes = kept
+
+
+def _block_at(board: Block, path: Tuple[int, ...]) -> Block:
+    """Return the Block reached from <board> by the child indices <path>."""
+    block = board
+    for i in path:
+        block = block.children[i]
+    return block
+
+
+def _random_block(board: Block) -> Block:
+    """Return a random Block of <board>, at a random level as RandomPlayer
+    chooses it, without needing the board to be laid out.
+    """
+    level = random.randint(board.level, board.max_depth)
+    block = board
+    while block.level < level and block.children:
+        block = random.choice(block.children)
+    return block
 
 
 if __name__ == '__main__':
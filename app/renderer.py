@@ -10,7 +10,7 @@ University of Toronto
 
 This file contains the Renderer class.
 """
-from typing import List, Tuple
+from typing import Dict, List, Optional, Set, Tuple
 import pygame
 
 WHITE = (255, 255, 255)
@@ -28,6 +28,12 @@ BOARD_WIDTH = 750
 BOARD_HEIGHT = 750
 TEXT_HEIGHT = 75
 
+# Renderer keeps the rendered image of every subdivided Block at least this
+# many pixels wide that it draws, so that redrawing an unchanged subtree is a
+# single blit.  When it holds SURFACE_CACHE_SIZE images, it starts over.
+CACHED_BLOCK_SIZE = 32
+SURFACE_CACHE_SIZE = 512
+
 
 def colour_name(colour: Tuple[int, int, int]) -> str:
     """Return the colour name associated with this colour value, or
@@ -39,7 +45,43 @@ def colour_name(colour: Tuple[int, int, int]) -> str:
     return ''
 
 
-class Renderer:
+def colour_index(colour: Tuple[int, int, int]) -> int:
+    """Return the index of this colour value in COLOUR_LIST.
+
+    Precondition: colour is in COLOUR_LIST.
+    """
+    return COLOUR_LIST.index(colour)
+
+
+def _block_rect(block: 'Block') -> pygame.Rect:
+    """Return the area of the screen covered by <block>."""
+    return pygame.Rect(block.position, (block.size, block.size))
+
+
+class BaseRenderer:
+    """Something that shows a Blocky game to its players.
+
+    This is an abstract class. Only child classes should be instantiated.
+    """
+
+    def draw(self, board: 'Block', player_id: int) -> None:
+        """Show <board> during the turn of the player with <player_id>.
+        """
+        raise NotImplementedError
+
+    def display_goal(self, player: 'Player') -> None:
+        """Show the goal of the given player.
+        """
+        raise NotImplementedError
+
+    def wait(self, milliseconds: int) -> None:
+        """Pause for <milliseconds> so that a computer player's move can be
+        followed on screen.
+        """
+        raise NotImplementedError
+
+
+class Renderer(BaseRenderer):
     """
     A class designed to handle the drawing and context for the board
     === Attributes ===
@@ -51,19 +93,48 @@ class Renderer:
          The height and width of the rendering window, in pixels.
     player_labels:
          list of player icons to display
+    pause:
+         Whether wait() actually pauses.  If False, computer players move
+         as fast as they can.
     """
+    # === Private Attributes ===
+    # _board:
+    #     The board shown on the screen, which this renderer observes for
+    #     changes, or None if the next frame must be drawn from scratch.
+    # _player_id:
+    #     The id of the player whose label is shown.
+    # _dirty:
+    #     The areas of the screen that changed since the last frame.
+    # _highlighted:
+    #     The highlighted Blocks in _board.
+    # _surfaces:
+    #     The rendered images of subtrees, keyed by the structural hash and
+    #     size of the subtree.
     displayed_image: pygame.Surface
     screen: pygame.Surface
     window_size: Tuple[int, int]
     player_labels: List[pygame.Surface]
+    pause: bool
+    _board: Optional['Block']
+    _player_id: int
+    _dirty: List[pygame.Rect]
+    _highlighted: Set['Block']
+    _surfaces: Dict[Tuple[int, int], pygame.Surface]
 
-    def __init__(self, num_players: int) -> None:
+    def __init__(self, num_players: int, pause: bool = True) -> None:
         """Initialize this renderer.
 
         <num_players> is the total number of players in this Game.  It is
         used to render a label showing the player whose move it is at any
-        given time.
+        given time.  <pause> is False to skip the delays between the moves
+        of computer players.
         """
+        self.pause = pause
+        self._board = None
+        self._player_id = 0
+        self._dirty = []
+        self._highlighted = set()
+        self._surfaces = {}
         pygame.init()
         self.displayed_image = \
             pygame.display.set_mode((BOARD_WIDTH, BOARD_HEIGHT + 75))
@@ -100,29 +171,141 @@ class Renderer:
         )
 
     def draw(self, board: 'Block', player_id: int) -> None:
-        """Clear the canvas and draw the blocks."""
-        # draw the background map onto the screen
-        self.screen.fill(WHITE)
+        """Draw the parts of the board that changed since the last frame.
 
-        selected = []
-        for colour, pos, size, width in board.rectangles_to_draw():
-            if colour == TEMPTING_TURQUOISE:
-                selected.append((colour, pos, size, width))
-            else:
-                pygame.draw.rect(self.screen, colour, (pos, size), width)
+        The first time a board is drawn, or after a goal has been displayed,
+        the whole board is drawn.  After that, only the Blocks that were
+        moved or had their highlighting changed are redrawn, and only those
+        areas of the window are updated.
+        """
+        if board is not self._board:
+            self._observe(board)
+            regions = [self.screen.get_rect()]
+        else:
+            regions = self._outermost(self._dirty)
+        self._dirty = []
 
-        # Draw highlighted rectangle borders last
-        for colour, x, y, width in selected:
-            pygame.draw.rect(self.screen, colour, (x, y), width)
+        for region in regions:
+            self._redraw(board, region)
 
-        self.displayed_image.blit(
-            self.player_labels[player_id], (0, BOARD_HEIGHT))
-        pygame.display.update()
+        if player_id != self._player_id or regions:
+            self._player_id = player_id
+            regions.append(self.displayed_image.blit(
+                self.player_labels[player_id], (0, BOARD_HEIGHT)))
+        if regions:
+            pygame.display.update(regions)
 
         # Check for new events; this should avoid the OSX issue for delayed
         # updating of the pygame window.
         pygame.event.peek([])
 
+    def _observe(self, board: 'Block') -> None:
+        """Stop observing the board drawn so far and start observing <board>.
+        """
+        if self._board is not None:
+            self._board.remove_observer(self._block_changed)
+        self._board = board
+        board.add_observer(self._block_changed)
+
+        self._highlighted = set()
+        blocks = [board]
+        for block in blocks:
+            if block.highlighted:
+                self._highlighted.add(block)
+            blocks.extend(block.children)
+
+    def _block_changed(self, block: 'Block', moved: bool) -> None:
+        """Record that the area of the screen covered by <block> is dirty.
+        """
+        if not moved:
+            if block.highlighted:
+                self._highlighted.add(block)
+            else:
+                self._highlighted.discard(block)
+        else:
+            # Smashing <block> may have removed highlighted Blocks from it.
+            self._highlighted = {b for b in self._highlighted
+                                 if self._in_board(b)}
+        self._dirty.append(_block_rect(block))
+
+    def _in_board(self, block: 'Block') -> bool:
+        """Return whether <block> is still part of the board drawn."""
+        while block.parent is not None:
+            if not any(child is block for child in block.parent.children):
+                return False
+            block = block.parent
+        return block is self._board
+
+    def _redraw(self, board: 'Block', region: pygame.Rect) -> None:
+        """Redraw the part of <board> that lies in <region> of the screen.
+        """
+        self.screen.set_clip(region)
+        self.screen.fill(WHITE, region)
+        self._draw_block(board, region)
+
+        # Draw highlighted rectangle borders last
+        for block in self._highlighted:
+            rect = _block_rect(block)
+            if rect.colliderect(region):
+                pygame.draw.rect(self.screen, TEMPTING_TURQUOISE, rect, 5)
+        self.screen.set_clip(None)
+
+    def _draw_block(self, block: 'Block', region: pygame.Rect) -> None:
+        """Draw the part of <block> that lies in <region> of the screen,
+        without any highlighting.
+        """
+        rect = _block_rect(block)
+        if not rect.colliderect(region):
+            return
+
+        if not block.children:
+            for colour, pos, size, width in block.rectangles_to_draw():
+                if colour != TEMPTING_TURQUOISE:
+                    pygame.draw.rect(self.screen, colour, (pos, size), width)
+        elif block.size >= CACHED_BLOCK_SIZE and region.contains(rect):
+            self.screen.blit(self._surface(block), block.position)
+        else:
+            for child in block.children:
+                self._draw_block(child, region)
+
+    def _surface(self, block: 'Block') -> pygame.Surface:
+        """Return the rendered image of <block>, without any highlighting.
+        """
+        key = (block.structural_hash(), block.size)
+        if key not in self._surfaces:
+            if len(self._surfaces) >= SURFACE_CACHE_SIZE:
+                self._surfaces.clear()
+            surface = pygame.Surface((block.size, block.size))
+            surface.fill(WHITE)
+            x, y = block.position
+            for colour, pos, size, width in block.rectangles_to_draw():
+                if colour != TEMPTING_TURQUOISE:
+                    pygame.draw.rect(surface, colour,
+                                     ((pos[0] - x, pos[1] - y), size), width)
+            self._surfaces[key] = surface
+        return self._surfaces[key]
+
+    @staticmethod
+    def _outermost(regions: List[pygame.Rect]) -> List[pygame.Rect]:
+        """Return the regions in <regions> that are not inside another one.
+
+        Blocks cover either nested or disjoint areas, so these cover all of
+        <regions>.
+        """
+        unique = sorted(set(tuple(region) for region in regions),
+                        key=lambda r: -r[2])
+        outermost = []
+        for region in unique:
+            if not any(outer.contains(region) for outer in outermost):
+                outermost.append(pygame.Rect(region))
+        return outermost
+
+    def wait(self, milliseconds: int) -> None:
+        """Pause for <milliseconds>, unless pausing has been turned off.
+        """
+        if self.pause:
+            pygame.time.wait(milliseconds)
+
     # For game start
     def display_goal(self, player: 'Player') -> None:
         """Display the goal for the given player.
@@ -130,6 +313,10 @@ class Renderer:
         self._message_box(WHITE, f'Click to see player {player.id}\'s goal')
         self._message_box(player.goal.colour,
                           f'Goal is: {player.goal.description()}')
+        # The message covered the board, so draw it all next time.
+        if self._board is not None:
+            self._board.remove_observer(self._block_changed)
+            self._board = None
 
     def _message_box(self, colour: Tuple[int, int, int], message: str) -> None:
         """Render a message in Pygame and and wait for a click.
@@ -162,6 +349,24 @@ class Renderer:
                 if e.type == pygame.MOUSEBUTTONDOWN:
                     return
 
+
+class NullRenderer(BaseRenderer):
+    """A renderer that shows nothing, for running games without pygame
+    being initialized or a display being available.
+
+    Only computer players can play a game rendered this way, since a
+    HumanPlayer needs the pygame event queue.
+    """
+
+    def draw(self, board: 'Block', player_id: int) -> None:
+        """Do nothing."""
+
+    def display_goal(self, player: 'Player') -> None:
+        """Do nothing."""
+
+    def wait(self, milliseconds: int) -> None:
+        """Return immediately."""
+
 if __name__ == '__main__':
     import python_ta
     python_ta.check_all(config={
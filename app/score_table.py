@@ -0,0 +1,58 @@
+"""Assignment 2 - Blocky
+
+=== CSC148 Fall 2017 ===
+Diane Horton and David Liu
+Department of Computer Science,
+University of Toronto
+
+
+=== Module Description ===
+
+This file contains the ScoreTable class, which scores a board for every
+colour and every kind of goal in a single pass, so that the scores of all
+players come from one flattening and one scan of the board.
+"""
+from typing import List, Tuple
+import numpy as np
+from app.block import Block
+from app.flood_fill import largest_blobs
+from app.renderer import COLOUR_LIST, colour_index
+
+
+class ScoreTable:
+    """The scores of every goal on one board.
+
+    A ScoreTable is a snapshot: it does not change when the board does.
+
+    === Public Attributes ===
+    blobs:
+        blobs[i] is the size of the largest connected blob of the colour
+        COLOUR_LIST[i], the score of a BlobGoal for that colour.
+    perimeters:
+        perimeters[i] is the number of unit cells of the colour
+        COLOUR_LIST[i] on the perimeter of the board, with corner cells
+        counted once for each side, the score of a PerimeterGoal for that
+        colour.
+
+    === Representation Invariants ===
+    - len(blobs) == len(perimeters) == len(COLOUR_LIST)
+    """
+    blobs: List[int]
+    perimeters: List[int]
+
+    def __init__(self, board: Block) -> None:
+        """Score every goal on <board>.
+        """
+        grid = board.flatten_array()
+        self.blobs = largest_blobs(grid, len(COLOUR_LIST))
+        edges = np.concatenate((grid[0], grid[-1], grid[:, 0], grid[:, -1]))
+        self.perimeters = np.bincount(
+            edges, minlength=len(COLOUR_LIST)).tolist()
+
+    def blob(self, colour: Tuple[int, int, int]) -> int:
+        """Return the size of the largest connected blob of <colour>."""
+        return self.blobs[colour_index(colour)]
+
+    def perimeter(self, colour: Tuple[int, int, int]) -> int:
+        """Return the number of unit cells of <colour> on the perimeter."""
+        return self.perimeters[colour_index(colour)]
@@ -0,0 +1,86 @@
+"""Assignment 2 - Blocky
+
+=== CSC148 Fall 2017 ===
+Diane Horton and David Liu
+Department of Computer Science,
+University of Toronto
+
+
+=== Module Description ===
+
+This file contains functions that convert a board to and from a compact
+binary form, for shipping boards between processes, storing replays and
+caching generated boards.
+
+The format is two bytes holding the level and max_depth of the Block,
+followed by a bitstream that lists its Blocks in preorder:
+    - a Block above max_depth starts with 1 bit: 1 if it is subdivided and
+      0 if not (a Block at max_depth is never subdivided, so has no bit);
+    - an undivided Block is followed by COLOUR_BITS bits holding the index
+      of its colour in COLOUR_LIST.
+The bitstream is padded with 0 bits to a whole number of bytes.
+"""
+from typing import Iterator, List, Tuple
+from app.block import Block, POOL
+from app.renderer import COLOUR_LIST, colour_index
+
+# The number of bits used to store the index of a colour.
+COLOUR_BITS = max(1, (len(COLOUR_LIST) - 1).bit_length())
+
+
+def serialize(board: Block) -> bytes:
+    """Return the compact binary form of <board>.
+
+    Positions, sizes and highlighting are not stored.
+    """
+    bits: List[str] = []
+    colour_codes = [format(i, f'0{COLOUR_BITS}b')
+                    for i in range(len(COLOUR_LIST))]
+    stack = [board]
+    while stack:
+        block = stack.pop()
+        if block.children:
+            bits.append('1')
+            stack.extend(reversed(block.children))
+        else:
+            if block.level < board.max_depth:
+                bits.append('0')
+            bits.append(colour_codes[colour_index(block.colour)])
+
+    stream = ''.join(bits)
+    stream += '0' * (-len(stream) % 8)
+    body = int(stream, 2).to_bytes(len(stream) // 8, 'big') if stream else b''
+    return bytes([board.level, board.max_depth]) + body
+
+
+def deserialize(data: bytes, top_left: Tuple[int, int] = (0, 0),
+                size: int = 0) -> Block:
+    """Return the board whose compact binary form is <data>, as returned by
+    serialize.
+
+    Lay the board out with its upper-left corner at <top_left> and the given
+    <size>, using update_block_locations.  The Blocks are taken from
+    app.block.POOL, so a copy that is no longer needed can be given back
+    with POOL.release.
+    """
+    level, max_depth = data[0], data[1]
+    stream = format(int.from_bytes(data[2:], 'big'),
+                    f'0{8 * (len(data) - 2)}b')
+    bits = iter(stream)
+    board = _build(bits, level, max_depth)
+    board.update_block_locations(top_left, size)
+    return board
+
+
+def _build(bits: Iterator[str], level: int, max_depth: int) -> Block:
+    """Return the Block at <level> described by the next bits of <bits>.
+    """
+    if level < max_depth and next(bits) == '1':
+        block = POOL.acquire(level,
+                             children=[_build(bits, level + 1, max_depth)
+                                       for _ in range(4)])
+    else:
+        code = ''.join(next(bits) for _ in range(COLOUR_BITS))
+        block = POOL.acquire(level, COLOUR_LIST[int(code, 2)])
+    block.max_depth = max_depth
+    return block
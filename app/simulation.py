@@ -0,0 +1,183 @@
+"""Assignment 2 - Blocky
+
+=== CSC148 Fall 2017 ===
+Diane Horton and David Liu
+Department of Computer Science,
+University of Toronto
+
+
+=== Module Description ===
+
+This file contains functions for playing many games of computer players
+at once, spread over all of the cores of the machine.
+
+Every game is seeded with its own GameConfig.seed inside the worker that
+plays it, so the results of a batch do not depend on the number of workers
+or on which worker plays which game.  Games with search or MCTS players are
+the exception: those players stop at a time limit, so how far they search
+depends on how busy the machine is.
+"""
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Iterator, List, Optional
+from app.game import Game
+from app.renderer import NullRenderer
+
+
+class GameConfig:
+    """The settings of one simulated game.
+
+    === Public Attributes ===
+    max_depth:
+        The maximum depth of the board.
+    num_turns:
+        The number of turns each player gets.
+    random_players:
+        The number of RandomPlayers in the game.
+    smart_players:
+        The difficulty of each SmartPlayer in the game.
+    search_players:
+        The time limit, in seconds, of each SearchPlayer in the game.
+    mcts_players:
+        The time limit, in seconds, of each MCTSPlayer in the game.
+    seed:
+        The seed for the random module, used to generate the board and the
+        goals and to drive every player's choices.
+
+    === Representation Invariants ===
+    - random_players + len(smart_players) + len(search_players)
+      + len(mcts_players) >= 1
+    """
+    max_depth: int
+    num_turns: int
+    random_players: int
+    smart_players: List[int]
+    search_players: List[float]
+    mcts_players: List[float]
+    seed: int
+
+    def __init__(self, max_depth: int, num_turns: int, random_players: int,
+                 smart_players: List[int], seed: int,
+                 search_players: Optional[List[float]] = None,
+                 mcts_players: Optional[List[float]] = None) -> None:
+        """Initialize this GameConfig.  If <search_players> or
+        <mcts_players> is None, the game has no players of that kind.
+        """
+        self.max_depth = max_depth
+        self.num_turns = num_turns
+        self.random_players = random_players
+        self.smart_players = smart_players
+        if search_players is None:
+            search_players = []
+        if mcts_players is None:
+            mcts_players = []
+        self.search_players = search_players
+        self.mcts_players = mcts_players
+        self.seed = seed
+
+
+class GameResult:
+    """The outcome of one simulated game.
+
+    === Public Attributes ===
+    index:
+        The position of this game's GameConfig in the batch.
+    config:
+        The settings the game was played with.
+    scores:
+        The final score of each player: random players first, then smart,
+        search and MCTS players, each in the order given in the config.
+    winner:
+        The index in <scores> of the winning player, as Game.run_game
+        reports it.
+    turns:
+        The total number of moves made in the game, not counting the turns
+        in which a player passed.
+    setup_seconds:
+        The wall time taken to generate the board and the players.
+    play_seconds:
+        The wall time taken to play the game.
+    """
+    index: int
+    config: GameConfig
+    scores: List[int]
+    winner: int
+    turns: int
+    setup_seconds: float
+    play_seconds: float
+
+    def __init__(self, index: int, config: GameConfig, scores: List[int],
+                 turns: int, setup_seconds: float,
+                 play_seconds: float) -> None:
+        """Initialize this GameResult."""
+        self.index = index
+        self.config = config
+        self.scores = scores
+        self.winner = scores.index(max(scores))
+        self.turns = turns
+        self.setup_seconds = setup_seconds
+        self.play_seconds = play_seconds
+
+
+def play(index: int, config: GameConfig) -> GameResult:
+    """Play the game described by <config> headless and return its result.
+
+    <index> is the position of <config> in its batch.
+    """
+    random.seed(config.seed)
+    start = time.perf_counter()
+    game = Game(config.max_depth, 0, config.random_players,
+                config.smart_players, NullRenderer(),
+                search_players=config.search_players,
+                mcts_players=config.mcts_players)
+    setup_seconds = time.perf_counter() - start
+
+    try:
+        start = time.perf_counter()
+        scores = game.run_game(config.num_turns, verbose=False)
+        play_seconds = time.perf_counter() - start
+    finally:
+        game.close()
+
+    return GameResult(index, config, scores, game.moves_made,
+                      setup_seconds, play_seconds)
+
+
+def simulate(configs: List[GameConfig],
+             max_workers: Optional[int] = None) -> Iterator[GameResult]:
+    """Play every game in <configs> in a pool of worker processes, yielding
+    each result as soon as its game finishes.
+
+    Results arrive in the order the games finish; use GameResult.index to
+    match them with <configs>.  If <max_workers> is None, use one worker
+    per core.
+    """
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(play, i, config)
+                   for i, config in enumerate(configs)]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def make_configs(num_games: int, seed: int, max_depth: int, num_turns: int,
+                 random_players: int, smart_players: List[int],
+                 search_players: Optional[List[float]] = None,
+                 mcts_players: Optional[List[float]] = None
+                 ) -> List[GameConfig]:
+    """Return <num_games> configs with the given settings, each with its own
+    seed derived from <seed>.
+    """
+    seeds = random.Random(seed)
+    return [GameConfig(max_depth, num_turns, random_players, smart_players,
+                       seeds.getrandbits(32), search_players, mcts_players)
+            for _ in range(num_games)]
+
+
+if __name__ == '__main__':
+    wins = [0, 0]
+    for result in simulate(make_configs(16, 1001, 4, 5, 0, [1, 5])):
+        wins[result.winner] += 1
+        print(f'Game {result.index}: scores {result.scores}, ' +
+              f'{result.play_seconds:.2f}s')
+    print(f'Wins by player: {wins}')
@@ -0,0 +1,231 @@
+"""Assignment 2 - Blocky
+
+=== CSC148 Fall 2017 ===
+Diane Horton and David Liu
+Department of Computer Science,
+University of Toronto
+
+
+=== Module Description ===
+
+This file contains the SpatialIndex class, which finds the Block at a pixel
+and level of a board in constant time, for Block.get_selected_block.
+
+Unit cells are numbered by their Morton (Z-order) code: the bits of the
+column and row of a cell, interleaved.  The cells covered by a Block at
+<level> are then exactly those whose code starts with the code of that
+Block, so a Block at any level is found by shifting the code of a cell, and
+a moved Block's cells form a single run that can be rewritten on its own.
+"""
+from typing import List, Optional, Tuple
+from app.block import Block, QUADRANT_OFFSETS
+
+
+class SpatialIndex:
+    """An index from the pixels of a board to the Blocks that cover them.
+
+    Each Block moved within <board> is queued through Block.add_observer,
+    and find rewrites only the runs of cells under the queued Blocks before
+    it answers.  If more Blocks are queued than the board has unit cells, or
+    the position, size or max_depth of the board has changed, find rebuilds
+    the whole index instead.
+
+    === Public Attributes ===
+    board:
+        The Block that is indexed.
+    """
+    # === Private Attributes ===
+    # _depth:
+    #     The number of levels below <board>, so that it is 2 ** _depth unit
+    #     cells wide.
+    # _layout:
+    #     The position, size and max_depth of <board> that the index was
+    #     built for.
+    # _x_codes, _y_codes:
+    #     _x_codes[x + 1] | _y_codes[y + 1] is the Morton code of the unit
+    #     cell that get_selected_block would descend to from the pixel
+    #     (board.position[0] + x, board.position[1] + y).  Pixels outside the
+    #     board are clamped to -1 or board.size first.
+    # _leaves:
+    #     _leaves[code] is the undivided Block covering the unit cell with
+    #     that Morton code.
+    # _levels:
+    #     _levels[k][code >> 2 * (_depth - k)] is the Block k levels below
+    #     <board> that covers the unit cell with that Morton code, or None if
+    #     that cell is covered by an undivided Block fewer than k levels
+    #     below <board>.
+    # _dirty:
+    #     The Blocks that have been mutated since the last refresh, or None
+    #     if so many have that the index is to be built from scratch.
+    board: Block
+    _depth: int
+    _layout: Tuple[Tuple[int, int], int, int]
+    _x_codes: List[int]
+    _y_codes: List[int]
+    _leaves: List[Optional[Block]]
+    _levels: List[List[Optional[Block]]]
+    _dirty: Optional[List[Block]]
+
+    def __init__(self, board: Block) -> None:
+        """Index the Blocks of <board> and start observing it.
+        """
+        self.board = board
+        self._dirty = []
+        self._build()
+        board.add_observer(self._block_changed)
+
+    def detach(self) -> None:
+        """Stop queueing the Blocks moved within the board, so that find can
+        no longer be trusted and must not be called again.
+        """
+        self.board.remove_observer(self._block_changed)
+
+    def find(self, location: Tuple[int, int], level: int) -> Block:
+        """Return the Block that board.get_selected_block(location, level)
+        would return.
+
+        Precondition: level >= board.level
+        """
+        board = self.board
+        position, size = board.position, board.size
+        if self._dirty is None or \
+                self._layout != (position, size, board.max_depth):
+            self._dirty = []
+            self._build()
+        elif self._dirty:
+            self._refresh()
+
+        x = location[0] - position[0]
+        if not 0 <= x < size:
+            x = -1 if x < 0 else size
+        y = location[1] - position[1]
+        if not 0 <= y < size:
+            y = -1 if y < 0 else size
+        code = self._x_codes[x + 1] | self._y_codes[y + 1]
+        leaf = self._leaves[code]
+        if level >= leaf.level:
+            return leaf
+        k = level - board.level
+        return self._levels[k][code >> 2 * (self._depth - k)]
+
+    def _build(self) -> None:
+        """Build the index from scratch.
+        """
+        board = self.board
+        self._depth = max(board.max_depth - board.level, 0)
+        self._layout = (board.position, board.size, board.max_depth)
+        self._x_codes = [_spread(column)
+                         for column in _columns(board.size, self._depth)]
+        self._y_codes = [code << 1 for code in self._x_codes]
+        self._leaves = [None] * 4 ** self._depth
+        self._levels = [[None] * 4 ** k for k in range(self._depth + 1)]
+        self._write(board, 0)
+
+    def _block_changed(self, block: Block, moved: bool) -> None:
+        """Record that <block> has been mutated.
+        """
+        if moved and self._dirty is not None:
+            self._dirty.append(block)
+            if len(self._dirty) > len(self._leaves):
+                self._dirty = None
+
+    def _refresh(self) -> None:
+        """Rewrite the entries of every dirty Block still in the board.
+
+        A Block that has been removed from the board was removed by a smash
+        of one of its ancestors, which is dirty too.
+        """
+        done = set()
+        for block in sorted(self._dirty, key=lambda b: b.level):
+            code = self._code(block)
+            if code is not None and id(block) not in done:
+                self._write(block, code)
+                done.update(id(b) for b in _subtree(block))
+        self._dirty = []
+
+    def _code(self, block: Block) -> Optional[int]:
+        """Return the Morton code of <block> within the board, or None if it
+        is no longer part of the board.
+        """
+        code, shift = 0, 0
+        while block is not self.board:
+            parent = block.parent
+            if parent is None:
+                return None
+            for i in range(len(parent.children)):
+                if parent.children[i] is block:
+                    column, row = QUADRANT_OFFSETS[i]
+                    code |= (row << 1 | column) << shift
+                    break
+            else:
+                return None
+            shift += 2
+            block = parent
+        return code
+
+    def _write(self, block: Block, code: int) -> None:
+        """Write the entries of <block>, whose Morton code is <code>, and of
+        the Blocks within it.
+        """
+        depth = self._depth
+        stack = [(block, code)]
+        while stack:
+            block, code = stack.pop()
+            k = block.level - self.board.level
+            self._levels[k][code] = block
+            if block.children and k < depth:
+                for i in range(len(block.children)):
+                    column, row = QUADRANT_OFFSETS[i]
+                    stack.append((block.children[i],
+                                  code << 2 | row << 1 | column))
+                continue
+
+            # Las celdas bajo una hoja la tienen a ella como hoja, y ningún
+            # bloque en los niveles más profundos.
+            width = 4 ** (depth - k)
+            start = code * width
+            self._leaves[start:start + width] = [block] * width
+            for j in range(k + 1, depth + 1):
+                width = 4 ** (j - k)
+                start = code * width
+                self._levels[j][start:start + width] = [None] * width
+
+
+def _columns(size: int, depth: int) -> List[int]:
+    """Return the column of unit cells, in a Block of <size> with <depth>
+    levels below it, that get_selected_block descends to from each pixel
+    offset from -1 to <size> inclusive.
+
+    Blocks are halved with integer division, so when <size> is not a power
+    of 2 the columns are not all equally wide; this follows the same
+    comparisons as get_selected_block.
+    """
+    columns = []
+    for x in range(-1, size + 1):
+        column, start, width = 0, 0, size
+        for _ in range(depth):
+            width //= 2
+            column <<= 1
+            if x >= start + width:
+                column |= 1
+                start += width
+        columns.append(column)
+    return columns
+
+
+def _spread(value: int) -> int:
+    """Return <value> with a 0 bit inserted above each of its bits."""
+    result, shift = 0, 0
+    while value:
+        result |= (value & 1) << shift
+        value >>= 1
+        shift += 2
+    return result
+
+
+def _subtree(block: Block) -> List[Block]:
+    """Return <block> and every Block within it."""
+    blocks = [block]
+    for b in blocks:
+        blocks.extend(b.children)
+    return blocks
@@ -0,0 +1,82 @@
+"""Assignment 2 - Blocky
+
+=== CSC148 Fall 2017 ===
+Diane Horton and David Liu
+Department of Computer Science,
+University of Toronto
+
+
+=== Module Description ===
+
+This file contains the TranspositionTable class, a cache of goal scores for
+board states that a search has already evaluated.
+
+Different sequences of moves often reach the same board (rotating one way and
+then back, or swapping twice), so a player that scores many candidate boards
+can look their scores up by the board's structural hash instead of scoring
+them again.
+"""
+from collections import OrderedDict
+from typing import Tuple, Type
+from app.block import Block
+from app.goal import Goal
+
+# The key of a cached score: the structural hash and size of the board, and
+# the class and colour of the goal.
+ScoreKey = Tuple[int, int, Type[Goal], Tuple[int, int, int]]
+
+
+class TranspositionTable:
+    """A bounded cache of goal scores, keyed by the structural hash and size
+    of the board and by the goal's class and colour.
+
+    When the table is full, the least recently used score is evicted.
+
+    === Public Attributes ===
+    capacity:
+        The maximum number of scores kept.
+    hits:
+        The number of lookups answered from the table.
+    misses:
+        The number of lookups that had to score the board.
+
+    === Representation Invariants ===
+    - capacity >= 1
+    """
+    # === Private Attributes ===
+    # _scores:
+    #     The cached scores, from least to most recently used.
+    capacity: int
+    hits: int
+    misses: int
+    _scores: 'OrderedDict[ScoreKey, int]'
+
+    def __init__(self, capacity: int = 100000) -> None:
+        """Initialize an empty table that holds at most <capacity> scores.
+        """
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self._scores = OrderedDict()
+
+    def score(self, goal: Goal, board: Block) -> int:
+        """Return goal.score(board), from the table if this board has been
+        scored for an equivalent goal before.
+        """
+        key = (board.structural_hash(), board.max_depth - board.level,
+               type(goal), goal.colour)
+        if key in self._scores:
+            self.hits += 1
+            self._scores.move_to_end(key)
+            return self._scores[key]
+
+        self.misses += 1
+        result = goal.score(board)
+        self._scores[key] = result
+        if len(self._scores) > self.capacity:
+            self._scores.popitem(last=False)
+        return result
+
+    def clear(self) -> None:
+        """Remove every score from this table."""
+        self._scores.clear()
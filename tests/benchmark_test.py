@@ -0,0 +1,41 @@
+"""Assignment 2 - Blocky: Benchmark tests
+
+=== Module Description ===
+
+This file contains a quick check that the benchmark suite runs, and tests for
+comparing its results with a baseline.
+"""
+import json
+from app.benchmark import BENCHMARKS, compare, main, run_suite
+
+
+def test_run_suite():
+    """Test that every benchmark runs on small boards."""
+    results = run_suite([2, 3], 148, 1, 0.0, verbose=False)
+    assert set(results) == set(BENCHMARKS)
+    for times in results.values():
+        assert set(times) == {'2', '3'}
+        assert all(seconds > 0 for seconds in times.values())
+
+
+def test_compare():
+    """Test that only slowdowns beyond the tolerance are regressions."""
+    baseline = {'flatten': {'3': 1.0, '4': 1.0}}
+    results = {'flatten': {'3': 1.2, '4': 1.3, '5': 9.0}}
+    regressions = compare(results, baseline, 0.25)
+    assert len(regressions) == 1
+    assert 'depth 4' in regressions[0]
+
+
+def test_main_baseline(tmp_path):
+    """Test the JSON output, and the exit status against a baseline."""
+    output = tmp_path / 'results.json'
+    args = ['--depths', '2', '2', '--only', 'flatten', '--repeat', '1',
+            '--min-time', '0']
+    assert main(args + ['--output', str(output)]) == 0
+    recorded = json.loads(output.read_text())
+    assert set(recorded['results']) == {'flatten'}
+
+    recorded['results']['flatten']['2'] /= 1000
+    output.write_text(json.dumps(recorded))
+    assert main(args + ['--baseline', str(output)]) == 1
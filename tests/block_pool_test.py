@@ -0,0 +1,105 @@
+"""Assignment 2 - Blocky: BlockPool tests
+
+=== Module Description ===
+
+This file contains tests for recycling Blocks through a BlockPool, and for
+the smashes and copies that use the shared pool.
+"""
+import random
+from app.block import Block, BlockPool, POOL, SMASH, random_init
+from app.renderer import COLOUR_LIST
+from app.serialization import serialize, deserialize
+
+
+def test_acquire_resets():
+    """Test that a released Block comes back as good as new."""
+    pool = BlockPool()
+    random.seed(148)
+    board = random_init(0, 3)
+    board.update_block_locations((10, 20), 640)
+    board.children[1].highlighted = True
+    board.add_observer(lambda block, moved: None)
+    pool.release(board)
+    assert len(pool) > 1
+
+    block = pool.acquire(2, COLOUR_LIST[1])
+    fresh = Block(2, COLOUR_LIST[1])
+    assert block.level == 2
+    assert block.colour == COLOUR_LIST[1]
+    assert block.children == []
+    assert block.parent is None
+    assert not block.highlighted
+    assert block.max_depth == 0
+    assert block.structural_hash() == fresh.structural_hash()
+
+    leaves = [pool.acquire(1, colour) for colour in COLOUR_LIST]
+    parent = pool.acquire(0, children=leaves)
+    assert parent.colour is None
+    assert all(leaf.parent is parent for leaf in leaves)
+
+
+def test_limit():
+    """Test that a pool keeps no more Blocks than its limit."""
+    pool = BlockPool(limit=5)
+    random.seed(148)
+    board = random_init(0, 4)
+    pool.release(board)
+    assert len(pool) <= 5
+
+
+def test_smash_undo_recycles():
+    """Test that undoing a smash recycles the Blocks it created, and that
+    the next smash reuses them.
+    """
+    random.seed(148)
+    board = random_init(0, 3)
+    board.update_block_locations((0, 0), 640)
+    block = board.children[0]
+    before = serialize(board)
+
+    token = block.apply_move(SMASH)
+    created = {id(child) for child in block.children}
+    block.undo_move(token)
+    assert serialize(board) == before
+
+    token = block.apply_move(SMASH)
+    assert {id(child) for child in block.children} == created
+    assert all(child.parent is block and child.level == block.level + 1
+               for child in block.children)
+    block.undo_move(token)
+    assert serialize(board) == before
+
+
+def test_nested_smash_undo():
+    """Test that nested smashes undo in order leave the board as it was and
+    keep the saved children out of the pool.
+    """
+    random.seed(148)
+    board = random_init(0, 4)
+    board.update_block_locations((0, 0), 640)
+    before = serialize(board)
+    held = board.children[2]
+    tokens = []
+    for _ in range(30):
+        blocks = [b for b, move in board.moves(include_smash=True)
+                  if move == SMASH]
+        block = random.choice(blocks)
+        tokens.append((block, block.apply_move(SMASH)))
+    for block, token in reversed(tokens):
+        block.undo_move(token)
+    assert serialize(board) == before
+    assert held.parent is board
+    assert board.children[2] is held
+
+
+def test_release_copy():
+    """Test that a released copy is rebuilt from recycled Blocks."""
+    random.seed(148)
+    board = random_init(0, 4)
+    encoded = serialize(board)
+    copy = deserialize(encoded)
+    POOL.release(copy)
+    available = len(POOL)
+    again = deserialize(encoded)
+    assert serialize(again) == encoded
+    assert len(POOL) < available
@@ -0,0 +1,77 @@
+"""Assignment 2 - Blocky: BoardBatch tests
+
+=== Module Description ===
+
+This file contains tests for generating batches of random boards and
+building their Block trees.
+"""
+import pytest
+from app.block import Block
+from app.board_batch import BoardBatch
+from app.renderer import COLOUR_LIST
+from app.serialization import serialize
+
+
+def _check(block: Block, level: int, max_depth: int) -> int:
+    """Check that <block> is a valid Block at <level> and return the number
+    of Blocks in it.
+    """
+    assert block.level == level
+    assert block.max_depth == max_depth
+    if not block.children:
+        assert block.colour in COLOUR_LIST
+        return 1
+    assert level < max_depth
+    assert block.colour is None
+    assert len(block.children) == 4
+    total = 1
+    for child in block.children:
+        assert child.parent is block
+        total += _check(child, level + 1, max_depth)
+    return total
+
+
+def test_boards_are_valid():
+    """Test that every board of a batch is a valid Block tree, laid out at
+    the requested position and size.
+    """
+    batch = BoardBatch(50, 4, 148)
+    assert len(batch) == 50
+    for i in range(len(batch)):
+        board = batch.board(i, (10, 20), 640)
+        assert _check(board, 0, 4) == batch.num_blocks(i)
+        assert board.position == (10, 20)
+        assert board.size == 640
+
+
+def test_seed():
+    """Test that a batch depends only on its seed."""
+    first = BoardBatch(20, 5, 148)
+    second = BoardBatch(20, 5, 148)
+    assert [serialize(first.board(i)) for i in range(20)] == \
+        [serialize(second.board(i)) for i in range(20)]
+    other = BoardBatch(20, 5, 149)
+    assert [serialize(first.board(i)) for i in range(20)] != \
+        [serialize(other.board(i)) for i in range(20)]
+
+
+def test_probability():
+    """Test that the split probability decides which Blocks are
+    subdivided.
+    """
+    leaves = BoardBatch(5, 3, 1, probability=lambda level: 0.0)
+    assert all(leaves.num_blocks(i) == 1 for i in range(5))
+
+    full = BoardBatch(5, 3, 1, probability=lambda level: 1.0)
+    for i in range(5):
+        assert full.num_blocks(i) == 1 + 4 + 16 + 64
+        assert len(full.board(i).flatten()) == 8
+
+
+def test_board_index():
+    """Test that boards can be indexed from the end, and not past it."""
+    batch = BoardBatch(3, 2, 7)
+    assert serialize(batch.board(-1)) == serialize(batch.board(2))
+    with pytest.raises(IndexError):
+        batch.board(3)
+    assert len(BoardBatch(0, 2, 7)) == 0
@@ -0,0 +1,72 @@
+"""Assignment 2 - Blocky: MCTS player tests
+
+=== Module Description ===
+
+This file contains tests for the Monte Carlo tree search of MCTSPlayer.
+"""
+import random
+from app.block import SMASH
+from app.game import Game, random_init
+from app.goal import BlobGoal, PerimeterGoal
+from app.player import MCTSPlayer
+from app.renderer import COLOUR_LIST, NullRenderer
+
+
+def test_mcts_player_iteration_budget():
+    """Test that the search stops after the given number of iterations, picks
+    the move searched most often, and leaves the board as it was.
+    """
+    random.seed(148)
+    board = random_init(0, 3)
+    player = MCTSPlayer(NullRenderer(), 0, BlobGoal(COLOUR_LIST[0]), 60,
+                        iterations=150)
+    player.opponent_goals = [PerimeterGoal(COLOUR_LIST[1])]
+
+    before = board.structural_hash()
+    block, action = player.choose_move(board)
+    assert board.structural_hash() == before
+
+    root = player._nodes[(before, 0)]
+    assert root.visits == 150
+    best = root.move_visits.index(max(root.move_visits))
+    assert root.moves[best] == (tuple(block.path()), action)
+
+
+def test_mcts_player_reuses_tree():
+    """Test that the positions searched while predicting the opponent's reply
+    are kept for the next turn.
+    """
+    random.seed(148)
+    board = random_init(0, 2)
+    player = MCTSPlayer(NullRenderer(), 0, BlobGoal(COLOUR_LIST[0]), 60,
+                        iterations=2000)
+    player.opponent_goals = [PerimeterGoal(COLOUR_LIST[1])]
+
+    player.choose_move(board)
+    # The result of a smash is random, so play the moves searched most often
+    # among the others.
+    for mover in (0, 1):
+        node = player._nodes[(board.structural_hash(), mover)]
+        best = max((i for i in range(len(node.moves))
+                    if node.moves[i][1] != SMASH),
+                   key=lambda i: node.move_visits[i])
+        path, action = node.moves[best]
+        block = board
+        for i in path:
+            block = block.children[i]
+        block.apply_move(action)
+
+    root = player._nodes[(board.structural_hash(), 0)]
+    searched = root.visits
+    assert searched > 0
+    player.iterations = 10
+    player.choose_move(board)
+    assert root.visits == searched + 10
+
+
+def test_mcts_player_game():
+    """Test a headless game with an MCTS player."""
+    random.seed(1001)
+    game = Game(3, 0, 1, [], NullRenderer(), mcts_players=[0.05])
+    assert isinstance(game.players[1], MCTSPlayer)
+    game.run_game(2, verbose=False)
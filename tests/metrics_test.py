@@ -0,0 +1,60 @@
+"""Assignment 2 - Blocky: Metrics tests
+
+=== Module Description ===
+
+This file contains tests for recording the metrics of a game.
+"""
+import io
+import json
+import random
+from app.game import Game
+from app.metrics import Metrics
+from app.renderer import NullRenderer
+
+
+def test_metrics_of_headless_game():
+    """Test that every turn is recorded, and that the game is left as it
+    was.
+    """
+    random.seed(1001)
+    game = Game(4, 0, 1, [5], NullRenderer())
+    metrics = Metrics()
+    scores = game.run_game(3, verbose=False, metrics=metrics)
+
+    assert len(metrics.turns) == 6
+    for turn in metrics.turns:
+        assert turn['calls']['Player.make_move'] == 1
+        assert turn['seconds'] >= turn['times']['Player.make_move']
+    smart_turns = [turn for turn in metrics.turns if turn['player'] == 1]
+    assert all(turn['counts']['candidates'] > 0 for turn in smart_turns)
+    assert metrics.totals()['calls']['Goal.score'] == \
+        sum(turn['counts']['nodes'] for turn in smart_turns)
+
+    for player in game.players:
+        assert player.metrics is None
+        assert 'make_move' not in vars(player)
+        assert 'score' not in vars(player.goal)
+    assert len(scores) == 2
+
+    file = io.StringIO()
+    metrics.write_json_lines(file)
+    lines = file.getvalue().splitlines()
+    assert [json.loads(line) for line in lines] == metrics.turns
+    assert metrics.summary().startswith('6 turns')
+
+
+def test_metrics_printed_score(capsys):
+    """Test that scoring the mover's goal to print it after each move is
+    timed within the turn.
+    """
+    random.seed(1001)
+    game = Game(3, 0, 2, [], NullRenderer())
+    metrics = Metrics()
+    game.run_game(2, verbose=True, metrics=metrics)
+    capsys.readouterr()
+
+    assert len(metrics.turns) == 4
+    for turn in metrics.turns:
+        assert turn['calls']['Goal.score'] == 1
+        assert turn['seconds'] >= turn['times']['Goal.score'] + \
+            turn['times']['Player.make_move']
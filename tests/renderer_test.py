@@ -0,0 +1,41 @@
+"""Assignment 2 - Blocky: Renderer tests
+
+=== Module Description ===
+
+This file contains tests for drawing boards, run without a real display.
+"""
+import os
+import random
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+import pygame
+from app.block import random_init, ROTATE_CLOCKWISE, SWAP_HORIZONTAL, \
+    SWAP_VERTICAL, SMASH
+from app.renderer import Renderer
+
+
+def test_partial_redraw_matches_full_redraw():
+    """Test that redrawing only the changed regions of a board gives the same
+    picture as drawing the whole board, through moves and highlighting.
+    """
+    random.seed(148)
+    renderer = Renderer(1, pause=False)
+    board = random_init(0, 4)
+    board.update_block_locations((0, 0), 750)
+    renderer.draw(board, 0)
+
+    for _ in range(40):
+        blocks = [board]
+        for block in blocks:
+            blocks.extend(block.children)
+        block = random.choice(blocks)
+        block.highlighted = not block.highlighted
+        block.apply_move(random.choice([ROTATE_CLOCKWISE, SWAP_HORIZONTAL,
+                                        SWAP_VERTICAL, SMASH]))
+        renderer.draw(board, 0)
+        partial = pygame.surfarray.array3d(renderer.screen)
+
+        # Forget the board, so the next frame is drawn from scratch.
+        board.remove_observer(renderer._block_changed)
+        renderer._board = None
+        renderer.draw(board, 0)
+        assert (pygame.surfarray.array3d(renderer.screen) == partial).all()
@@ -0,0 +1,104 @@
+"""Assignment 2 - Blocky: Search player tests
+
+=== Module Description ===
+
+This file contains tests for the lookahead search of SearchPlayer.
+"""
+import random
+from types import SimpleNamespace
+import app.player as player_module
+from app.block import Block
+from app.game import Game, random_init
+from app.goal import BlobGoal, PerimeterGoal
+from app.player import SearchPlayer
+from app.renderer import COLOUR_LIST, NullRenderer
+
+
+def minimax(board: Block, goals: list, depth: int, ply: int) -> int:
+    """Return the value of <board> searched exhaustively to <depth> plies,
+    as SearchPlayer values it for goals[0] against the other <goals>.
+    """
+    moves = list(board.moves())
+    if depth == 0 or not moves:
+        return goals[0].score(board) - max(g.score(board) for g in goals[1:])
+    values = []
+    for block, action in moves:
+        token = block.apply_move(action)
+        values.append(minimax(board, goals, depth - 1, ply + 1))
+        block.undo_move(token)
+    return max(values) if ply % len(goals) == 0 else min(values)
+
+
+def test_search_player_matches_minimax():
+    """Test that the move chosen is the best one by exhaustive search, and
+    that the board is left as it was.
+    """
+    random.seed(148)
+    board = random_init(0, 2)
+    goals = [BlobGoal(COLOUR_LIST[0]), PerimeterGoal(COLOUR_LIST[1])]
+    player = SearchPlayer(NullRenderer(), 0, goals[0], 60, max_plies=2)
+    player.opponent_goals = goals[1:]
+
+    before = board.structural_hash()
+    block, action = player.choose_move(board)
+    assert board.structural_hash() == before
+    assert player.depth_reached == 2
+
+    token = block.apply_move(action)
+    chosen = minimax(board, goals, 1, 1)
+    block.undo_move(token)
+    assert chosen == minimax(board, goals, 2, 0)
+
+
+def test_search_player_deadline():
+    """Test that a move is still chosen when no search can be completed."""
+    random.seed(148)
+    board = random_init(0, 4)
+    player = SearchPlayer(NullRenderer(), 0, BlobGoal(COLOUR_LIST[2]), 1e-9)
+    player.opponent_goals = [PerimeterGoal(COLOUR_LIST[3])]
+
+    before = board.structural_hash()
+    assert player.choose_move(board) is not None
+    assert player.depth_reached == 0
+    assert board.structural_hash() == before
+
+
+def test_search_player_time_limit(monkeypatch):
+    """Test that no position is evaluated once the deadline has passed, on
+    a board with many more moves than fit in the time limit.
+
+    The clock is simulated: it advances by one millisecond per position
+    evaluated, so the test does not depend on the speed of the machine.
+    """
+    now = [0.0]
+    monkeypatch.setattr(player_module, 'time',
+                        SimpleNamespace(perf_counter=lambda: now[0]))
+    random.seed(148)
+    board = random_init(0, 5)
+    player = SearchPlayer(NullRenderer(), 0, BlobGoal(COLOUR_LIST[2]), 0.05)
+    player.opponent_goals = [PerimeterGoal(COLOUR_LIST[3])]
+    evaluate = player._evaluate
+    late = []
+
+    def timed_evaluate(board: Block) -> float:
+        if now[0] > player.time_limit:
+            late.append(now[0])
+        now[0] += 0.001
+        return evaluate(board)
+
+    player._evaluate = timed_evaluate
+    assert len(list(board.moves())) > 100
+    assert player.choose_move(board) is not None
+    assert player.depth_reached == 0
+    assert late == []
+
+
+def test_search_player_game():
+    """Test a headless game with a search player, and that every player is
+    told the goals of the others in turn order.
+    """
+    random.seed(1001)
+    game = Game(3, 0, 1, [1], NullRenderer(), search_players=[0.05])
+    goals = [player.goal for player in game.players]
+    assert game.players[1].opponent_goals == [goals[2], goals[0]]
+    game.run_game(2, verbose=False)
@@ -0,0 +1,43 @@
+"""Assignment 2 - Blocky: Serialization tests
+
+=== Module Description ===
+
+This file contains tests for converting boards to and from their compact
+binary form.
+"""
+import random
+from app.block import Block, random_init
+from app.renderer import COLOUR_LIST
+from app.serialization import serialize, deserialize
+
+
+def test_round_trip():
+    """Test that deserializing a serialized board rebuilds the same board,
+    laid out at the requested position and size.
+    """
+    random.seed(148)
+    for max_depth in range(6):
+        board = random_init(0, max_depth)
+        board.update_block_locations((10, 20), 640)
+
+        copy = deserialize(serialize(board), (10, 20), 640)
+
+        assert copy.max_depth == board.max_depth
+        assert copy.flatten() == board.flatten()
+        assert copy.structural_hash() == board.structural_hash()
+        assert sorted(copy.rectangles_to_draw()) == \
+            sorted(board.rectangles_to_draw())
+
+
+def test_compact_size():
+    """Test that a board takes 2 bytes plus its bits, padded to a byte.
+    """
+    leaf = Block(0, COLOUR_LIST[3])
+    assert serialize(leaf) == bytes([0, 0, 0b11000000])
+
+    board = Block(0, children=[Block(1, colour) for colour in COLOUR_LIST])
+    board.max_depth = 1
+    for child in board.children:
+        child.max_depth = 1
+    # 1 split bit, then four 2-bit colours with no split bits at max_depth.
+    assert serialize(board) == bytes([0, 1, 0b10001101, 0b10000000])
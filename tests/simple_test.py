@@ -15,10 +15,17 @@ Please use this as a starting point to check your work and write your own
 tests!
 """
 from typing import List, Tuple
-from app.renderer import COLOUR_LIST
-from app.block import Block
+import pytest
+from app.renderer import COLOUR_LIST, NullRenderer
+from app.block import Block, HIGHLIGHT_COLOUR, ROTATE_CLOCKWISE, \
+    ROTATE_COUNTERCLOCKWISE, SWAP_HORIZONTAL, SWAP_VERTICAL, SMASH, \
+    TOP_SIDE, LEFT_SIDE, random_init
 from app.goal import PerimeterGoal, BlobGoal
 from app.game import Game
+from app.player import SmartPlayer
+from app.score_table import ScoreTable
+from app.serialization import serialize, deserialize
+from app.transposition import TranspositionTable
 
 
 def test_flatten() -> None:
@@ -44,6 +51,24 @@ def test_flatten() -> None:
         'Result of flatten is incorrect.'
 
 
+def test_flatten_array() -> None:
+    """Test that flatten_array holds the colour indices of flatten, and that
+    the goals score it the same way as the board itself.
+    """
+    board, flatten_expected = construct_board()
+
+    grid = board.flatten_array()
+
+    assert grid.shape == (2**board.max_depth, 2**board.max_depth)
+    assert [[COLOUR_LIST[i] for i in column] for column in grid.tolist()] \
+        == flatten_expected
+    for colour in COLOUR_LIST:
+        assert BlobGoal(colour).score_array(grid) == \
+            BlobGoal(colour).score(board)
+        assert PerimeterGoal(colour).score_array(grid) == \
+            PerimeterGoal(colour).score(board)
+
+
 def test_rectangles_to_draw() -> None:
     """Test the rectangles_to_draw method of the Block class.
     """
@@ -114,6 +139,31 @@ def test_rectangles_to_draw() -> None:
     assert actual_rectangles.union(expected_rectangles) == expected_rectangles
 
 
+def test_rectangles_to_draw_after_changes() -> None:
+    """Test that rectangles_to_draw is up to date after moves, highlighting
+    and relocation, and that iter_rectangles agrees with it.
+    """
+    board = Block(0, children=[Block(1, COLOUR_LIST[i]) for i in range(4)])
+    board.max_depth = 1
+    board.update_block_locations((0, 0), 16)
+    before = board.rectangles_to_draw()
+    assert board.rectangles_to_draw() is before
+
+    board.children[0].highlighted = True
+    assert ((HIGHLIGHT_COLOUR, (8, 0), (8, 8), 5)
+            in board.rectangles_to_draw())
+
+    board.apply_move(ROTATE_CLOCKWISE)
+    assert ((HIGHLIGHT_COLOUR, (8, 8), (8, 8), 5)
+            in board.rectangles_to_draw())
+    assert (COLOUR_LIST[0], (8, 8), (8, 8), 0) in board.rectangles_to_draw()
+
+    board.update_block_locations((0, 0), 32)
+    assert ((HIGHLIGHT_COLOUR, (16, 16), (16, 16), 5)
+            in board.rectangles_to_draw())
+    assert list(board.iter_rectangles()) == board.rectangles_to_draw()
+
+
 def test_get_selected_block():
     """Test the selection process for getting individual blocks out of the board
 
@@ -138,6 +188,30 @@ def test_get_selected_block():
     assert board.get_selected_block((100, 10), 0) is not None
 
 
+def test_get_selected_block_after_moves():
+    """Test that get_selected_block follows the board as it is mutated and
+    relocated.
+    """
+    board, _ = construct_board()
+    board.update_block_locations((0, 0), 50)
+    block = board.get_selected_block((40, 10), 2)
+    assert block is board.children[0].children[0]
+
+    board.apply_move(ROTATE_CLOCKWISE)
+    assert board.get_selected_block((40, 40), 2) is block
+    assert board.get_selected_block((40, 40), 1) is block.parent
+
+    token = block.parent.apply_move(SMASH)
+    smashed = board.get_selected_block((40, 40), 2)
+    assert smashed.parent is block.parent and smashed is not block
+    block.parent.undo_move(token)
+    assert board.get_selected_block((40, 40), 2) is block
+
+    board.update_block_locations((100, 100), 50)
+    assert board.get_selected_block((140, 140), 3) is block
+    assert board.get_selected_block((0, 0), 1) is board.children[1]
+
+
 def test_swap():
     """Test the swapping of blocks in the tree.
 
@@ -200,6 +274,170 @@ def test_rotate():
     assert equal_boards(board, ref_board)
 
 
+def test_rotate_through_held_blocks():
+    """Test that rotations and swaps made through Blocks held from before
+    earlier moves leave the board as if it had been built from scratch.
+    """
+    import random
+    random.seed(148)
+    board = random_init(0, 4)
+    board.update_block_locations((0, 0), 16)
+    blocks = [board]
+    for block in blocks:
+        blocks.extend(block.children)
+
+    for _ in range(50):
+        block = random.choice(blocks)
+        block.apply_move(random.choice([ROTATE_CLOCKWISE,
+                                        ROTATE_COUNTERCLOCKWISE,
+                                        SWAP_HORIZONTAL, SWAP_VERTICAL]))
+        copy = deserialize(serialize(board), (0, 0), 16)
+        assert board.structural_hash() == copy.structural_hash()
+        assert sorted(board.rectangles_to_draw()) == \
+            sorted(copy.rectangles_to_draw())
+        held = random.choice(blocks)
+        same = copy.get_selected_block(held.position, held.level)
+        assert held.flatten() == same.flatten()
+        assert held.structural_hash() == same.structural_hash()
+        assert held.border_count(COLOUR_LIST[0]) == \
+            same.border_count(COLOUR_LIST[0])
+
+
+def test_moves_leave_other_boards_cached(monkeypatch):
+    """Test that moves on one board leave the positions derived within
+    another board valid, and still invalidate those of the moved board.
+    """
+    import random
+    random.seed(148)
+    board = random_init(0, 4)
+    board.update_block_locations((0, 0), 16)
+    other = random_init(0, 4)
+    other.update_block_locations((0, 0), 16)
+    blocks = [other]
+    for block in blocks:
+        blocks.extend(block.children)
+    positions = [(block.position, block.size) for block in blocks]
+    held = board.children[1]
+    assert held.position == (0, 0)
+
+    placed = []
+    original = Block._place
+
+    def counted(self):
+        placed.append(self)
+        original(self)
+    monkeypatch.setattr(Block, '_place', counted)
+    board.apply_move(ROTATE_CLOCKWISE)
+    board.children[0].apply_move(SWAP_VERTICAL)
+    assert [(block.position, block.size) for block in blocks] == positions
+    assert placed == []
+    assert held.position == (8, 0)
+    assert held in placed
+
+
+def test_moves():
+    """Test that moves() lists each move that changes the board once, and
+    skips the moves that cannot change it.
+    """
+    board, _ = construct_board()
+    moves = list(board.moves())
+    assert len(moves) == 8
+    assert len(set((id(block), move) for block, move in moves)) == 8
+    for block, move in moves:
+        before = board.flatten()
+        token = block.apply_move(move)
+        assert board.flatten() != before
+        block.undo_move(token)
+
+    # Identical halves cannot be swapped and a single colour cannot rotate.
+    halves = Block(0, children=[Block(1, COLOUR_LIST[0]),
+                                Block(1, COLOUR_LIST[0]),
+                                Block(1, COLOUR_LIST[1]),
+                                Block(1, COLOUR_LIST[1])])
+    assert set(move for _, move in halves.moves()) == \
+        {ROTATE_CLOCKWISE, ROTATE_COUNTERCLOCKWISE, SWAP_VERTICAL}
+    uniform = Block(0, children=[Block(1, COLOUR_LIST[2]) for _ in range(4)])
+    assert list(uniform.moves()) == []
+
+    # Smashes are listed for every Block but the root above max_depth.
+    assert sum(move == SMASH for _, move in board.moves(True)) == 4
+
+
+def test_undo_move():
+    """Test that undoing moves, in reverse order, restores the board.
+    """
+    import random
+    random.seed(148)
+    board, _ = construct_board()
+    ref_board, _ = construct_board()
+
+    tokens = []
+    for block, move in [(board, SWAP_VERTICAL),
+                        (board.children[1], ROTATE_CLOCKWISE),
+                        (board.children[2], SMASH),
+                        (board, ROTATE_COUNTERCLOCKWISE),
+                        (board.children[3], SWAP_HORIZONTAL)]:
+        tokens.append((block, block.apply_move(move)))
+    assert not equal_boards(board, ref_board)
+
+    for block, token in reversed(tokens):
+        block.undo_move(token)
+    assert equal_boards(board, ref_board)
+
+
+def test_structural_hash():
+    """Test that the structural hash follows the board through moves, and
+    that a transposition table recognizes boards it has scored before.
+    """
+    board, _ = construct_board()
+    ref_board, _ = construct_board()
+    original = board.structural_hash()
+    assert original == ref_board.structural_hash()
+
+    board.children[0].rotate(1)
+    assert board.structural_hash() != original
+    board.children[0].rotate(3)
+    assert board.structural_hash() == original
+
+    board.swap(0)
+    assert board.structural_hash() != original
+    board.swap(0)
+    assert board.structural_hash() == original
+
+    table = TranspositionTable(capacity=2)
+    goal = BlobGoal(COLOUR_LIST[3])
+    assert table.score(goal, board) == 5
+    assert table.score(goal, ref_board) == 5
+    assert (table.hits, table.misses) == (1, 1)
+    board.swap(1)
+    assert table.score(goal, board) == goal.score(board)
+    assert table.misses == 2
+
+
+def test_attach_used_boards():
+    """Test that boards that were hashed, rotated and searched as boards of
+    their own hash and answer get_selected_block correctly once they are the
+    children of a new board.
+    """
+    import random
+    random.seed(148)
+    parts = [random_init(1, 3) for _ in range(4)]
+    for part in parts:
+        part.update_block_locations((0, 0), 8)
+        part.structural_hash()
+        part.apply_move(ROTATE_CLOCKWISE)
+        part.get_selected_block((1, 1), 3)
+    board = Block(0, children=parts)
+    board.max_depth = 3
+    board.update_block_locations((0, 0), 16)
+    copy = deserialize(serialize(board), (0, 0), 16)
+    assert board.structural_hash() == copy.structural_hash()
+    for x, y in [(12, 1), (1, 1), (1, 12), (12, 12)]:
+        assert board.get_selected_block((x, y), 3).flatten() == \
+            copy.get_selected_block((x, y), 3).flatten()
+    assert board.get_selected_block((12, 1), 1) is parts[0]
+
+
 def test_smash():
     """Test to see if the block's children change after the smash operation.
 
@@ -246,6 +484,39 @@ def test_blob_goal():
         assert goal.score(board) == score
 
 
+def test_blob_goal_after_moves():
+    """Test that a BlobGoal rescoring the same board after a move agrees
+    with a fresh BlobGoal scoring it from scratch.
+    """
+    board, _ = construct_board()
+    goals = [BlobGoal(colour) for colour in COLOUR_LIST]
+    for goal in goals:
+        goal.score(board)
+
+    board.children[0].swap(1)
+    board.swap(0)
+    board.children[1].rotate(1)
+
+    for goal in goals:
+        assert goal.score(board) == BlobGoal(goal.colour).score(board)
+
+
+def test_blob_goal_large_blob():
+    """Test blobs with more cells than the recursion limit allows frames.
+    """
+    board = Block(0, COLOUR_LIST[0])
+    board.max_depth = 8
+    goal = BlobGoal(COLOUR_LIST[0])
+    assert goal.score(board) == 4 ** 8
+    assert goal.score_array(board.flatten_array()) == 4 ** 8
+
+    board.max_depth = 7
+    flattened = board.flatten()
+    visited = [[-1] * len(flattened) for _ in flattened]
+    assert goal._undiscovered_blob_size((5, 9), flattened, visited) == 4 ** 7
+    assert all(all(cell == 1 for cell in column) for column in visited)
+
+
 def test_perimeter_goal():
     """
     Test the blob goal for the given board
@@ -267,6 +538,88 @@ def test_perimeter_goal():
         assert goal.score(board) == score
 
 
+def test_smart_player_flatten_array(monkeypatch):
+    """
+    Test that a smart player with a blob goal reads the board through
+    flatten_array once, to seed the goal's BlobIndex, rather than once per
+    candidate move
+    """
+    import random
+    random.seed(148)
+    board = random_init(0, 4)
+    calls = []
+    flatten_array = Block.flatten_array
+
+    def counted(block: Block):
+        calls.append(block)
+        return flatten_array(block)
+
+    monkeypatch.setattr(Block, 'flatten_array', counted)
+    player = SmartPlayer(NullRenderer(), 0, BlobGoal(COLOUR_LIST[0]), 5)
+    player.make_move(board)
+    player.make_move(board)
+    assert calls == [board]
+
+
+def test_perimeter_goal_walk():
+    """
+    Test that the perimeter walk used on a first score, and the aggregates
+    used on later scores of the same board, agree with the flattened board
+    as the board changes
+    """
+    import random
+    random.seed(148)
+    for max_depth in range(5):
+        board = random_init(0, max_depth)
+        goals = [PerimeterGoal(colour) for colour in COLOUR_LIST]
+        for _ in range(10):
+            grid = board.flatten_array()
+            for goal in goals:
+                assert goal.score_walk(board) == goal.score_array(grid)
+                assert goal.score(board) == goal.score_array(grid)
+            moves = list(board.moves(include_smash=True))
+            if not moves:
+                break
+            block, move = random.choice(moves)
+            block.apply_move(move)
+
+
+def test_colour_aggregates():
+    """Test the colour counts of a board and of its parts, before and after
+    moves.
+    """
+    board, _ = construct_board()
+    for move in (None, ROTATE_CLOCKWISE, SWAP_VERTICAL):
+        if move is not None:
+            board.apply_move(move)
+        grid = board.flatten_array()
+        for i, colour in enumerate(COLOUR_LIST):
+            assert board.colour_count(colour) == (grid == i).sum()
+            assert board.side_count(TOP_SIDE, colour) == (grid[:, 0] == i).sum()
+            assert board.side_count(LEFT_SIDE, colour) == \
+                (grid[0, :] == i).sum()
+            assert board.border_count(colour) == \
+                PerimeterGoal(colour).score_array(grid)
+
+    assert board.uniform_colour() is None
+    leaf = [child for child in board.children if not child.children][0]
+    assert leaf.uniform_colour() == leaf.colour
+    assert leaf.colour_count(leaf.colour) == 4
+
+
+def test_score_table():
+    """Test that a ScoreTable agrees with every goal on random boards.
+    """
+    import random
+    random.seed(148)
+    for depth in range(5):
+        board = random_init(0, depth)
+        table = ScoreTable(board)
+        for colour in COLOUR_LIST:
+            for goal in (BlobGoal(colour), PerimeterGoal(colour)):
+                assert goal.score_from(table) == goal.score(board)
+
+
 def test_random_player_game():
     """
     Put 3 random players against each other and ensure the game ends
@@ -287,6 +640,42 @@ def test_smart_player_game():
     game.run_game(3)
 
 
+def test_headless_game():
+    """
+    Put a random player and two smart players against each other without
+    a display and ensure the game ends
+    """
+    import random
+    random.seed(1001)
+    game = Game(4, 0, 1, [1, 5], NullRenderer())
+    game.run_game(3)
+
+
+def test_smart_player_close():
+    """
+    Test that closing a smart player shuts down its worker processes, and
+    that a later move starts new ones
+    """
+    import random
+    random.seed(1001)
+    board, _ = construct_board()
+    player = SmartPlayer(NullRenderer(), 0, BlobGoal(COLOUR_LIST[0]), 1,
+                         workers=2)
+    player.make_move(board)
+    executor = player._executor
+    assert executor is not None
+
+    player.close()
+    assert player._executor is None
+    with pytest.raises(RuntimeError):
+        executor.submit(print)
+    player.close()
+
+    player.make_move(board)
+    assert player._executor is not None
+    player.close()
+
+
 ###############################################################################
 # Test helpers
 ###############################################################################
@@ -0,0 +1,76 @@
+"""Assignment 2 - Blocky: Simulation tests
+
+=== Module Description ===
+
+This file contains tests for playing batches of games, and for scoring
+candidate moves, in worker processes.
+"""
+import random
+from concurrent.futures import ProcessPoolExecutor
+from app.block import random_init, ROTATE_CLOCKWISE, SWAP_VERTICAL
+from app.goal import BlobGoal, PerimeterGoal
+from app.parallel import evaluate_candidates
+from app.player import SmartPlayer
+from app.renderer import COLOUR_LIST, NullRenderer
+from app.simulation import GameConfig, make_configs, play, simulate
+
+
+def test_simulate_is_reproducible():
+    """Test that a batch gives the same results whatever the number of
+    workers, and the same results as playing each game directly.
+    """
+    configs = make_configs(4, 148, 3, 2, 1, [1])
+
+    one_worker = {r.index: r.scores for r in simulate(configs, max_workers=1)}
+    two_workers = {r.index: r.scores for r in simulate(configs, max_workers=2)}
+
+    assert one_worker == two_workers
+    for i, config in enumerate(configs):
+        result = play(i, config)
+        assert result.scores == one_worker[i]
+        assert result.turns == 4
+        assert result.scores[result.winner] == max(result.scores)
+
+
+def test_search_and_mcts_players():
+    """Test that batches can include search and MCTS players, and that a
+    turn in which a player passes is not counted as a move.
+    """
+    configs = make_configs(2, 148, 2, 2, 1, [], [0.01], [0.01])
+    for i, config in enumerate(configs):
+        result = play(i, config)
+        assert len(result.scores) == 3
+        assert result.turns <= 6
+
+    # A board of one undivided Block has no moves for a SearchPlayer.
+    passing = GameConfig(0, 3, 0, [], 148, search_players=[0.01])
+    assert play(0, passing).turns == 0
+
+
+def test_evaluate_candidates_matches_sequential():
+    """Test that scoring candidates in worker processes picks the same move
+    as scoring them one after another.
+    """
+    random.seed(148)
+    board = random_init(0, 4)
+    blocks = [board]
+    for block in blocks:
+        blocks.extend(block.children)
+    candidates = [(block, move) for block in blocks
+                  for move in (ROTATE_CLOCKWISE, SWAP_VERTICAL)]
+
+    with ProcessPoolExecutor(2) as executor:
+        for goal in (BlobGoal(COLOUR_LIST[0]), PerimeterGoal(COLOUR_LIST[1])):
+            player = SmartPlayer(NullRenderer(), 0, goal, 5)
+            assert evaluate_candidates(board, goal, candidates, executor, 3) \
+                == player._best_candidate(board, candidates)
+
+
+def test_evaluate_no_candidates():
+    """Test that scoring no candidate moves in worker processes finds
+    none.
+    """
+    board = random_init(0, 2)
+    with ProcessPoolExecutor(1) as executor:
+        assert evaluate_candidates(board, BlobGoal(COLOUR_LIST[0]), [],
+                                   executor, 2) == -1